@@ -1,3 +1,27 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from unfold.admin import ModelAdmin
+from .jobs import retry
+from .models import Job
 
-# Register your models here.
+
+def retry_jobs(_modeladmin, request, queryset):
+    count = retry(queryset)
+    messages.success(request, f'Se reencolaron {count} tareas.')
+
+retry_jobs.short_description = "Reintentar tareas seleccionadas"
+
+
+@admin.register(Job)
+class JobAdmin(ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'created_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task',)
+    readonly_fields = (
+        'task', 'payload', 'status', 'attempts', 'max_attempts', 'run_after',
+        'locked_until', 'locked_by', 'last_error', 'created_at', 'updated_at',
+    )
+    exclude = ('blob',)
+    actions = [retry_jobs]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,77 @@
+"""
+Namespaces de cache invalidados por contador de generación.
+
+Cada namespace (y opcionalmente cada scope dentro de él, por ejemplo un
+usuario) guarda en el cache un contador de generación que forma parte de
+todas sus llaves. Incrementar el contador deja inaccesibles, en O(1), todas
+las llaves anteriores del namespace; las entradas viejas simplemente expiran.
+Esto reemplaza los borrados por patrón (``delete_many(['productlist_*'])``),
+que el API de cache de Django no soporta.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+class CacheNamespace:
+    def __init__(self, name, timeout=60 * 60 * 24):
+        self.name = name
+        self.timeout = timeout
+
+    def _generation_key(self, scope=None):
+        if scope is None:
+            return f'ns:{self.name}:generation'
+        return f'ns:{self.name}:{scope}:generation'
+
+    def generation(self, scope=None):
+        """Generación vigente del namespace (o del scope dentro del namespace)"""
+        key = self._generation_key(scope)
+        generation = cache.get(key)
+        if generation is None:
+            # Si el contador se perdió se arranca desde un valor nuevo para no
+            # volver a una generación que ya se usó antes
+            cache.add(key, time.time_ns(), None)
+            generation = cache.get(key)
+        return generation
+
+    def bump(self, scope=None):
+        """Invalida todas las llaves del namespace (o del scope)"""
+        key = self._generation_key(scope)
+        # Sin ``incr``: el de DatabaseCache le pone a la llave el timeout por
+        # defecto y el contador expiraría solo a los pocos minutos. El valor
+        # nuevo nunca es menor que el vigente ni repite uno anterior
+        generation = max(time.time_ns(), (cache.get(key) or 0) + 1)
+        cache.set(key, generation, None)
+        return generation
+
+    def key_prefix(self, scope=None, generation=None):
+        if generation is None:
+            generation = self.generation(scope)
+        if scope is None:
+            return f'{self.name}:g{generation}'
+        return f'{self.name}:{scope}:g{generation}'
+
+    def key(self, *parts, scope=None, generation=None):
+        prefix = self.key_prefix(scope, generation)
+        return ':'.join([prefix, *(str(part) for part in parts)])
+
+    def get(self, *parts, scope=None, default=None):
+        return cache.get(self.key(*parts, scope=scope), default)
+
+    def set(self, *parts, value, scope=None, timeout=None):
+        cache.set(self.key(*parts, scope=scope), value, self.timeout if timeout is None else timeout)
+
+    def get_or_set(self, *parts, default, scope=None, timeout=None):
+        """``default`` puede ser un callable, que solo se evalúa si no hay valor"""
+        return cache.get_or_set(
+            self.key(*parts, scope=scope),
+            default,
+            self.timeout if timeout is None else timeout,
+        )
+
+
+# Namespaces usados en el proyecto
+catalog_cache = CacheNamespace('catalog')
+settings_cache = CacheNamespace('settings')
+history_cache = CacheNamespace('history')  # scope: id del usuario
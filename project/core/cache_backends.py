@@ -0,0 +1,303 @@
+"""
+Backend de cache en dos niveles.
+
+Nivel 1: un LRU en memoria del proceso, limitado en entradas y en tiempo de
+vida. Nivel 2: un cache compartido por todos los workers (la tabla de
+``DatabaseCache`` en este proyecto). Las lecturas se resuelven primero en
+memoria; las escrituras van al cache compartido y se publican en un registro
+de invalidaciones (secuencia + una entrada por llave) que cada worker lee
+como máximo una vez por ``SYNC_INTERVAL`` segundos para descartar sus copias
+locales desactualizadas.
+
+Publicar cuesta varias consultas al cache compartido, así que ``set``/``add``
+solo se publican para las llaves que cambian de valor: los contadores de
+generación de ``core.cache`` (``ns:…``). Todo lo demás se guarda bajo una
+llave con la generación, así que una copia local nunca queda vieja; si otra
+llave se sobrescribe, los demás workers la ven a más tardar en
+``LOCAL_TIMEOUT`` segundos. ``delete`` e ``incr`` siempre se publican.
+
+Configuración (``OPTIONS``):
+
+- ``LOCATION``: nombre del nivel local; como en ``LocMemCache``, todos los
+  hilos del proceso comparten el mismo LRU.
+- ``SHARED_ALIAS``: alias del cache compartido en ``CACHES``.
+- ``MAX_ENTRIES``: entradas máximas del LRU local.
+- ``LOCAL_TIMEOUT``: segundos máximos que una entrada vive en memoria.
+- ``SYNC_INTERVAL``: cada cuántos segundos se revisa el registro de
+  invalidaciones.
+- ``LOG_TIMEOUT``: cuánto vive cada entrada del registro en el cache
+  compartido. Un worker que se atrase más que eso vacía su nivel local.
+- ``PUBLISH_PREFIXES``: prefijos de las llaves cuyo ``set``/``add`` se
+  publica (por defecto ``['ns:']``).
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+INVALIDATION_SEQUENCE_KEY = '__tiered__:sequence'
+INVALIDATION_LOG_PREFIX = '__tiered__:log'
+PUBLISH_ATTEMPTS = 5
+# Si un worker se atrasó más que esto no se lee el registro: se vacía su nivel local
+MAX_SYNC_GAP = 500
+
+
+class _LocalTier:
+    """Estado del nivel local compartido por todos los hilos del proceso"""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # llave -> (valor serializado, vence)
+        self.lock = threading.RLock()
+        self.last_sequence = None
+        self.next_sync = 0.0
+        self.stats = {
+            'local_hits': 0,
+            'local_misses': 0,
+            'shared_hits': 0,
+            'shared_misses': 0,
+            'local_evictions': 0,
+            'invalidations_received': 0,
+            'invalidations_sent': 0,
+            'full_resyncs': 0,
+        }
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self._max_local_entries = int(options.get('MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 60))
+        self._sync_interval = float(options.get('SYNC_INTERVAL', 1))
+        self._log_timeout = int(options.get('LOG_TIMEOUT', 60 * 10))
+        self._publish_prefixes = tuple(options.get('PUBLISH_PREFIXES', ['ns:']))
+
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(location or 'default', _LocalTier())
+        self._local = self._tier.entries
+        self._lock = self._tier.lock
+        self._stats = self._tier.stats
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # ------------------------------------------------------------------
+    # Nivel local
+    # ------------------------------------------------------------------
+
+    def _local_get(self, local_key):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._local[local_key]
+                return None
+            self._local.move_to_end(local_key)
+            return entry
+
+    def _local_set(self, local_key, value, timeout):
+        lifetime = self._local_timeout
+        if timeout is not None:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            self._local_delete(local_key)
+            return
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._local[local_key] = (pickled, time.monotonic() + lifetime)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_local_entries:
+                self._local.popitem(last=False)
+                self._stats['local_evictions'] += 1
+
+    def _local_delete(self, local_key):
+        with self._lock:
+            self._local.pop(local_key, None)
+
+    def _local_clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _resolve_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    # ------------------------------------------------------------------
+    # Registro de invalidaciones compartido
+    # ------------------------------------------------------------------
+
+    def _publish(self, local_key):
+        """Avisa a los demás workers que ``local_key`` cambió"""
+        shared = self.shared
+        for _ in range(PUBLISH_ATTEMPTS):
+            # Se maneja a mano en vez de con ``incr``: el de DatabaseCache le
+            # pone el timeout por defecto a la llave. Si la secuencia se perdió
+            # (expiró o fue descartada) se arranca desde un valor nuevo para no
+            # chocar con entradas viejas del registro.
+            sequence = shared.get(INVALIDATION_SEQUENCE_KEY)
+            sequence = time.time_ns() if sequence is None else sequence + 1
+            shared.set(INVALIDATION_SEQUENCE_KEY, sequence, None)
+            # Leer y escribir no es atómico: si otro worker obtuvo el mismo
+            # número, ``add`` falla y se pide el siguiente
+            if shared.add(f'{INVALIDATION_LOG_PREFIX}:{sequence}', local_key, self._log_timeout):
+                break
+        else:
+            # Sin número propio: un salto en la secuencia obliga a todos los
+            # workers a vaciar su nivel local
+            shared.set(INVALIDATION_SEQUENCE_KEY, time.time_ns(), None)
+        with self._lock:
+            self._stats['invalidations_sent'] += 1
+            # Las invalidaciones propias ya se aplicaron localmente
+            if self._tier.last_sequence is not None and sequence == self._tier.last_sequence + 1:
+                self._tier.last_sequence = sequence
+
+    def sync(self, force=False):
+        """Aplica las invalidaciones publicadas por otros workers"""
+        now = time.monotonic()
+        if not force and now < self._tier.next_sync:
+            return
+        self._tier.next_sync = now + self._sync_interval
+
+        sequence = self.shared.get(INVALIDATION_SEQUENCE_KEY)
+        with self._lock:
+            last = self._tier.last_sequence
+        if sequence == last:
+            return
+        if last is None or sequence is None or not 0 < sequence - last <= MAX_SYNC_GAP:
+            # Primer arranque, el cache compartido se vació/reinició o hubo
+            # demasiados cambios: se descarta todo el nivel local
+            self._reset_local(sequence, count_resync=last is not None)
+            return
+
+        wanted = [f'{INVALIDATION_LOG_PREFIX}:{n}' for n in range(last + 1, sequence + 1)]
+        entries = self.shared.get_many(wanted)
+        if len(entries) != len(wanted):
+            # Registro incompleto (expiró o se está escribiendo): no se sabe
+            # qué cambió, así que se descarta todo el nivel local
+            self._reset_local(sequence)
+            return
+
+        with self._lock:
+            for local_key in entries.values():
+                self._local.pop(local_key, None)
+            self._stats['invalidations_received'] += len(entries)
+            self._tier.last_sequence = sequence
+
+    def _reset_local(self, sequence, count_resync=True):
+        with self._lock:
+            self._local.clear()
+            self._tier.last_sequence = sequence
+            if count_resync:
+                self._stats['full_resyncs'] += 1
+
+    # ------------------------------------------------------------------
+    # API de cache de Django
+    # ------------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.sync()
+        entry = self._local_get(local_key)
+        if entry is not None:
+            self._stats['local_hits'] += 1
+            return pickle.loads(entry[0])
+        self._stats['local_misses'] += 1
+
+        missing = object()
+        value = self.shared.get(key, missing, version=version)
+        if value is missing:
+            self._stats['shared_misses'] += 1
+            return default
+        self._stats['shared_hits'] += 1
+        # No se sabe cuánto le queda en el compartido: se usa el límite local
+        self._local_set(local_key, value, None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, self._resolve_timeout(timeout), version=version)
+        self._local_set(local_key, value, self._resolve_timeout(timeout))
+        if key.startswith(self._publish_prefixes):
+            self._publish(local_key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if not self.shared.add(key, value, self._resolve_timeout(timeout), version=version):
+            return False
+        self._local_set(local_key, value, self._resolve_timeout(timeout))
+        if key.startswith(self._publish_prefixes):
+            self._publish(local_key)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        touched = self.shared.touch(key, self._resolve_timeout(timeout), version=version)
+        self._local_delete(local_key)
+        return touched
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted = self.shared.delete(key, version=version)
+        self._local_delete(local_key)
+        self._publish(local_key)
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.shared.incr(key, delta, version=version)
+        self._local_delete(local_key)
+        self._publish(local_key)
+        return value
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.sync()
+        if self._local_get(local_key) is not None:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        self.shared.clear()
+        self._local_clear()
+        # Un salto en la secuencia obliga a los demás workers a vaciar su nivel local
+        self.shared.set(INVALIDATION_SEQUENCE_KEY, time.time_ns(), None)
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+
+    def stats(self):
+        """Contadores de aciertos/fallos por nivel de este proceso"""
+        with self._lock:
+            data = dict(self._stats)
+            data['local_entries'] = len(self._local)
+        data['local_max_entries'] = self._max_local_entries
+        data['last_sequence'] = self._tier.last_sequence
+        return data
+
+
+def tiered_cache_stats():
+    """Métricas de todos los caches en dos niveles configurados"""
+    stats = {}
+    for alias in caches.settings:
+        backend = caches[alias]
+        if isinstance(backend, TieredCache):
+            stats[alias] = backend.stats()
+    return stats
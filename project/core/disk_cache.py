@@ -0,0 +1,93 @@
+"""
+Cache de archivos en disco limitado por bytes totales, con desalojo LRU.
+
+Cada entrada es un archivo (nombre = SHA-256 de la llave) y su fecha de
+modificación marca el último uso: se actualiza en cada lectura. Cuando el
+total pasa de ``max_bytes`` se borran los archivos usados hace más tiempo
+hasta bajar a ``max_bytes * low_watermark``, para no limpiar en cada
+escritura.
+
+Varios procesos pueden compartir el directorio: el disco es la fuente de
+verdad. Cada proceso lleva una estimación del total (sus propias escrituras)
+y la corrige con el recorrido completo que hace al limpiar.
+"""
+
+import hashlib
+import os
+import threading
+from uuid import uuid4
+
+
+class DiskLRUCache:
+    def __init__(self, location, max_bytes, low_watermark=0.9):
+        self.location = str(location)
+        self.max_bytes = max_bytes
+        self.low_watermark = low_watermark
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.location, digest[:2], digest)
+
+    def get(self, key):
+        """Contenido guardado para ``key`` o None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Uso reciente: es lo último que se desaloja
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: otro proceso nunca lee un archivo a medias
+        tmp_path = f"{path}.{uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            full = self._size is None or self._size > self.max_bytes
+        if full:
+            self.cull()
+
+    def cull(self):
+        """Recorre el directorio y desaloja lo menos usado si pasa el tope"""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.location):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * self.low_watermark
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+        with self._lock:
+            self._size = total
+        return total
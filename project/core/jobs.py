@@ -0,0 +1,180 @@
+"""
+Cola de tareas en segundo plano sobre la base de datos.
+
+Las tareas se registran con ``@task`` en el módulo ``tasks.py`` de cada app
+y se encolan con ``enqueue``. Encolar es un INSERT en la misma transacción
+del cambio que la origina: la tarea existe si y solo si el cambio se guardó.
+``python manage.py worker`` las ejecuta:
+
+- Para tomar una tarea el worker la pasa a ``running`` con un UPDATE
+  condicional (sin ``SELECT ... FOR UPDATE``, que SQLite no soporta), así que
+  entre varios workers solo uno la gana.
+- Mientras corre queda bloqueada hasta ``locked_until`` (timeout de
+  visibilidad). Si el worker muere, al vencerse otro worker la retoma.
+- Si falla se reintenta con espera exponencial hasta ``max_attempts``;
+  después queda ``failed`` con el último error y se puede reintentar desde el
+  admin. Una tarea que lanza ``PermanentError`` queda ``failed`` sin más
+  reintentos.
+"""
+
+import logging
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+logger = logging.getLogger(__name__)
+
+# Segundos que una tarea queda bloqueada para el worker que la tomó
+DEFAULT_TIMEOUT = 60 * 5
+DEFAULT_MAX_ATTEMPTS = 5
+# Espera antes del primer reintento; se duplica en cada intento
+DEFAULT_RETRY_DELAY = 10
+MAX_RETRY_DELAY = 60 * 60
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    func: Callable
+    timeout: int
+    max_attempts: int
+    retry_delay: int
+    bind: bool
+
+
+class PermanentError(Exception):
+    """Error que no se arregla reintentando (p. ej. datos inválidos)"""
+
+
+_registry = {}
+
+
+def task(name, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+         retry_delay=DEFAULT_RETRY_DELAY, bind=False):
+    """
+    Registra una función como tarea. Se llama con el ``payload`` del job como
+    argumentos por nombre; con ``bind=True`` recibe además el ``Job`` primero.
+    """
+    def decorator(func):
+        _registry[name] = Task(name, func, timeout, max_attempts, retry_delay, bind)
+        return func
+    return decorator
+
+
+def get_task(name):
+    if name not in _registry:
+        autodiscover_modules('tasks')
+    return _registry.get(name)
+
+
+def enqueue(name, payload=None, blob=None, delay=0):
+    """Crea el job de la tarea ``name``; ``payload`` debe ser serializable a JSON"""
+    from .models import Job
+
+    registered = get_task(name)
+    if registered is None:
+        raise LookupError(f"Tarea no registrada: {name}")
+    return Job.objects.create(
+        task=name,
+        payload=payload or {},
+        blob=blob,
+        max_attempts=registered.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim(worker_id, candidates=10):
+    """Toma la siguiente tarea disponible para ``worker_id`` (o None)"""
+    from .models import Job
+
+    now = timezone.now()
+    available = (
+        Q(status='pending', run_after__lte=now)
+        # Tareas de un worker que murió o se pasó de su timeout
+        | Q(status='running', locked_until__lt=now)
+    )
+    rows = list(
+        Job.objects.filter(available)
+        .order_by('run_after', 'id')
+        .values_list('id', 'task', 'status', 'locked_until')[:candidates]
+    )
+    for job_id, name, status, locked_until in rows:
+        registered = get_task(name)
+        timeout = registered.timeout if registered else DEFAULT_TIMEOUT
+        # Solo gana el worker cuyo UPDATE encuentra la fila como la leyó
+        claimed = Job.objects.filter(pk=job_id, status=status, locked_until=locked_until).update(
+            status='running',
+            locked_until=now + timedelta(seconds=timeout),
+            locked_by=worker_id,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _finish(job, **fields):
+    """Actualiza el job solo si este worker todavía lo tiene tomado"""
+    from .models import Job
+
+    return Job.objects.filter(
+        pk=job.pk, status='running', locked_by=job.locked_by, attempts=job.attempts,
+    ).update(locked_until=None, updated_at=timezone.now(), **fields)
+
+
+def run_job(job):
+    """Ejecuta un job ya tomado con ``claim``. Devuelve True si terminó bien."""
+    registered = get_task(job.task)
+    if registered is None:
+        _finish(job, status='failed', last_error=f"Tarea no registrada: {job.task}")
+        return False
+    if job.attempts > job.max_attempts:
+        # Se venció el timeout en todos los intentos sin que la tarea terminara
+        _finish(job, status='failed', last_error=job.last_error or 'Se agotó el tiempo de ejecución')
+        return False
+
+    try:
+        args = (job,) if registered.bind else ()
+        registered.func(*args, **job.payload)
+    except Exception as exc:
+        error = traceback.format_exc()
+        logger.exception("Falló la tarea %s (intento %s/%s)", job, job.attempts, job.max_attempts)
+        if job.is_last_attempt or isinstance(exc, PermanentError):
+            _finish(job, status='failed', last_error=error)
+        else:
+            delay = min(registered.retry_delay * 2 ** (job.attempts - 1), MAX_RETRY_DELAY)
+            _finish(
+                job,
+                status='pending',
+                run_after=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+            )
+        return False
+
+    _finish(job, status='done', blob=None)
+    return True
+
+
+def retry(queryset):
+    """Vuelve a encolar los jobs (p. ej. fallidos) desde cero"""
+    return queryset.exclude(status='running').update(
+        status='pending',
+        attempts=0,
+        run_after=timezone.now(),
+        locked_until=None,
+        locked_by='',
+    )
+
+
+def purge_finished(older_than=timedelta(days=7)):
+    """Borra los jobs terminados hace más de ``older_than``"""
+    from .models import Job
+
+    deleted, _ = Job.objects.filter(status='done', updated_at__lt=timezone.now() - older_than).delete()
+    return deleted
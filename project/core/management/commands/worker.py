@@ -0,0 +1,63 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import claim, purge_finished, run_job
+
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano encoladas en la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Procesa las tareas disponibles y termina')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Segundos de espera cuando no hay tareas (por defecto 2)')
+        parser.add_argument('--max-jobs', type=int, default=0,
+                            help='Termina después de ejecutar N tareas (0 = sin límite)')
+
+    def handle(self, *args, **options):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        # SIGTERM (reinicio del dyno) deja terminar la tarea en curso
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(f"Worker {worker_id} iniciado")
+        processed = failed = 0
+        next_purge = 0.0
+
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() >= next_purge:
+                purge_finished()
+                next_purge = time.monotonic() + PURGE_INTERVAL
+
+            job = claim(worker_id)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.monotonic()
+            ok = run_job(job)
+            processed += 1
+            failed += not ok
+            self.stdout.write(
+                f"{'✅' if ok else '❌'} {job} ({job.attempts}/{job.max_attempts}) "
+                f"{(time.monotonic() - started) * 1000:.0f} ms"
+            )
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(f"Worker detenido: {processed} tareas, {failed} con error")
+
+    def _stop(self, signum, frame):
+        self.stopping = True
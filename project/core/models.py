@@ -1,3 +1,43 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Job(models.Model):
+    """Tarea en segundo plano (ver ``core.jobs``)"""
+
+    STATUS = [
+        ('pending', 'Pendiente'),
+        ('running', 'En ejecución'),
+        ('done', 'Terminada'),
+        ('failed', 'Fallida'),
+    ]
+
+    task = models.CharField(max_length=100, verbose_name='Tarea')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Parámetros')
+    # Datos binarios de la tarea (p. ej. la imagen subida); se liberan al terminar
+    blob = models.BinaryField(null=True, blank=True, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS, default='pending', verbose_name='Estado')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Intentos')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='Intentos máximos')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Ejecutar desde')
+    # Mientras un worker la ejecuta; si se vence sin terminar, otro la retoma
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name='Bloqueada hasta')
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name='Worker')
+    last_error = models.TextField(blank=True, verbose_name='Último error')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Tarea en segundo plano'
+        verbose_name_plural = 'Tareas en segundo plano'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk}"
+
+    @property
+    def is_last_attempt(self):
+        return self.attempts >= self.max_attempts
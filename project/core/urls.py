@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import HomeView
+from .views import HomeView, cache_stats
 
 app_name = 'core'
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
+    path('cache-stats/', cache_stats, name='cache_stats'),
     # Quitamos la ruta welcome/ porque ahora está en la raíz del sitio
 ]
\ No newline at end of file
@@ -1,6 +1,9 @@
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from .cache_backends import tiered_cache_stats
 
 
 class HomeView(LoginRequiredMixin, TemplateView):
@@ -22,3 +25,9 @@ class WelcomeView(TemplateView):
         if request.user.is_authenticated:
             return redirect('core:home')
         return super().dispatch(request, *args, **kwargs)
+
+
+@staff_member_required
+def cache_stats(request):
+    """Aciertos/fallos por nivel del cache de este worker (solo staff)"""
+    return JsonResponse({'caches': tiered_cache_stats()})
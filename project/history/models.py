@@ -1,3 +1,11 @@
-from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
-# Create your models here.
+from orders.models import Order
+from .stats import invalidate_order_stats
+
+
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_history_stats(sender, instance, using=None, **kwargs):
+    """Invalidar las estadísticas del historial del usuario dueño del pedido"""
+    invalidate_order_stats(instance.user_id, using=using)
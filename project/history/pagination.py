@@ -0,0 +1,102 @@
+"""Paginación por cursor (keyset) para el historial de pedidos."""
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class CursorPage:
+    """
+    Página obtenida con paginación keyset sobre ``(created_at, id)``.
+
+    Expone la misma interfaz básica que ``django.core.paginator.Page``
+    (``has_next``, ``has_previous``, ``has_other_pages``) más los tokens
+    opacos para pedir la página siguiente y la anterior.
+    """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], 'next')
+        return ''
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], 'prev')
+        return ''
+
+
+def encode_cursor(order, direction):
+    """Genera el token opaco a partir del último/primer pedido mostrado"""
+    raw = f"{direction}|{order.created_at.isoformat()}|{order.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Devuelve (dirección, created_at, id) o None si el token no es válido"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate_by_cursor(queryset, token, per_page=10):
+    """
+    Pagina ``queryset`` en orden ``-created_at, -id`` sin COUNT ni OFFSET.
+
+    Cada página es un rango sobre el índice ``(user, created_at, id)``, por
+    lo que el costo es el mismo sin importar qué tan profundo se navegue.
+    Un token inválido devuelve la primera página.
+    """
+    cursor = decode_cursor(token)
+
+    if cursor is None:
+        rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+        return CursorPage(rows[:per_page], len(rows) > per_page, False)
+
+    direction, created_at, pk = cursor
+    if direction == 'next':
+        rows = list(
+            queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+            .order_by('-created_at', '-id')[:per_page + 1]
+        )
+        return CursorPage(rows[:per_page], len(rows) > per_page, True)
+
+    rows = list(
+        queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+        .order_by('created_at', 'id')[:per_page + 1]
+    )
+    page_rows = rows[:per_page]
+    page_rows.reverse()
+    return CursorPage(page_rows, True, len(rows) > per_page)
@@ -0,0 +1,60 @@
+"""Estadísticas de pedidos por usuario para el historial, con cache."""
+
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from core.cache import history_cache
+from orders.models import Order
+
+ORDER_STATS_TIMEOUT = 60 * 60 * 24
+
+
+def get_order_stats(user):
+    """
+    Devuelve los contadores del historial (total, pendientes y entregados).
+
+    Se calculan con una sola consulta de agregación condicional y se guardan
+    en el namespace de historial del usuario hasta que uno de sus pedidos cambie.
+    """
+    def compute():
+        return (
+            Order.objects.filter(user=user)
+            .exclude(payment_status='cancelled')
+            .aggregate(
+                total_orders=Count('pk', filter=~Q(status='draft')),
+                pending_orders=Count('pk', filter=Q(status='pending')),
+                completed_orders=Count('pk', filter=Q(status='delivered')),
+            )
+        )
+
+    return history_cache.get_or_set('stats', default=compute, scope=user.pk, timeout=ORDER_STATS_TIMEOUT)
+
+
+# Usuarios cuyo historial se invalida al confirmar la transacción en curso
+_pending = threading.local()
+
+
+def invalidate_order_stats(user_id, using=None):
+    """
+    Invalida todo lo cacheado del historial del usuario (estadísticas
+    incluidas) cuando la transacción en curso se confirme: antes, un lector
+    concurrente cachearía los contadores viejos con la generación nueva.
+
+    Cada llamada registra su callback, pero el primero que corre invalida a
+    todos los usuarios pendientes y los demás no hacen nada: guardar un
+    pedido varias veces en una transacción (``set_items``) es un solo
+    ``bump`` por usuario. Si la transacción se revierte, los usuarios quedan
+    pendientes hasta la próxima confirmación (invalidar de más no hace daño).
+    """
+    if not hasattr(_pending, 'users'):
+        _pending.users = set()
+    _pending.users.add(user_id)
+    transaction.on_commit(_flush_pending_invalidations, using=using)
+
+
+def _flush_pending_invalidations():
+    users, _pending.users = _pending.users, set()
+    for user_id in users:
+        history_cache.bump(scope=user_id)
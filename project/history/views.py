@@ -1,16 +1,25 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.conf import settings as django_settings
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db.models import (
+    BooleanField, Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, Q,
+    Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, QueryDict
 from django.views.decorators.http import require_http_methods, require_POST
 from django.utils import timezone
 from django.contrib import messages
 from django.shortcuts import redirect
 from django.urls import reverse, NoReverseMatch
 from datetime import datetime, timedelta
+from decimal import Decimal
 import json
-from orders.models import Order, BusinessSettings, OrderModificationRequest
+from orders.models import Order, OrderItem, BusinessSettings, OrderModificationRequest
+from orders.services import search_orders
+from .pagination import paginate_by_cursor
+from .stats import get_order_stats
 
 
 @login_required
@@ -31,18 +40,9 @@ def order_history_list(request):
         Order.objects.filter(user=request.user)
         .exclude(status='draft')
         .exclude(payment_status='cancelled')
-        .select_related('user')
-        .prefetch_related('items__product')
     )
     
     # Aplicar filtros
-    if search_query:
-        orders = orders.filter(
-            Q(order_number__icontains=search_query) |
-            Q(customer_name__icontains=search_query) |
-            Q(customer_phone__icontains=search_query)
-        )
-    
     if status_filter:
         orders = orders.filter(status=status_filter)
     
@@ -55,57 +55,38 @@ def order_history_list(request):
     # Ordenar por fecha más reciente
     orders = orders.order_by('-created_at')
     
-
-    for i, order in enumerate(orders):
-        # Calcular subtotal de productos
-        items = order.items.all()
-        order.calculated_subtotal = sum(item.total_price for item in items)    
-        # Calcular costo de envío basado en configuración actual del negocio
-        if order.delivery_type == 'delivery':
-            if order.calculated_subtotal >= settings.free_delivery_threshold:
-                order.calculated_shipping = 0
-            else:
-                order.calculated_shipping = settings.delivery_cost  # ✅ CAMBIO: Usar configuración del negocio
-        else:
-            order.calculated_shipping = 0
-        
-        # Calcular total final
-        order.calculated_total = order.calculated_subtotal + order.calculated_shipping
-        
-        # Verificar si califica para envío gratis
-        order.qualifies_for_free_shipping = (
-            order.delivery_type == 'delivery' and 
-            order.calculated_subtotal >= settings.free_delivery_threshold
-        )
-        
-        # ✅ AGREGAR: Verificar si se puede cancelar (24 horas antes)
-        order.can_be_cancelled = _can_cancel_order(order)
-        
-    # Paginación
-    paginator = Paginator(orders, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    
-    # ✅ USAR los métodos y campos existentes del modelo Order
-    stats = {
-        'total_orders': (
-            Order.objects.filter(user=request.user)
-            .exclude(status='draft')
-            .exclude(payment_status='cancelled')
-            .count()
-        ),
-        'pending_orders': Order.objects.filter(
-            user=request.user, status='pending'
-        )
-        .exclude(payment_status='cancelled')
-        .count(),
-        'completed_orders': Order.objects.filter(
-            user=request.user, status='delivered'
-        )
-        .exclude(payment_status='cancelled')
-        .count(),
-    }
+    cursor_token = request.GET.get('cursor', '')
+    cursor_pagination = (
+        bool(cursor_token)
+        or request.GET.get('pagination') == 'cursor'
+        or getattr(django_settings, 'HISTORY_CURSOR_PAGINATION', False)
+    )
+    
+    # Búsqueda indexada por número, nombre o teléfono; ordenada por relevancia
+    # salvo en modo cursor, que necesita el orden por fecha
+    if search_query:
+        orders = search_orders(orders, search_query, ranked=not cursor_pagination)
+    
+    # Paginación: los totales se calculan en SQL solo para los pedidos de la página
+    if cursor_pagination:
+        # Keyset sobre (created_at, id): sin COUNT ni OFFSET, costo constante por página
+        page_obj = paginate_by_cursor(_annotate_order_totals(orders, settings), cursor_token, 10)
+    else:
+        paginator = Paginator(orders, 10)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+        page_obj.object_list = _annotate_order_totals(page_obj.object_list, settings)
+    
+    
+    # Filtros activos para los enlaces de paginación, ya codificados para la URL
+    filter_params = QueryDict(mutable=True)
+    for name, value in (('search', search_query), ('status', status_filter),
+                        ('date_from', date_from), ('date_to', date_to)):
+        if value:
+            filter_params[name] = value
+    
+    # ✅ Estadísticas en una sola consulta, cacheadas por usuario
+    stats = get_order_stats(request.user)
     
     context = {
         'page_obj': page_obj,
@@ -115,7 +96,9 @@ def order_history_list(request):
         'status_filter': status_filter,
         'date_from': date_from,
         'date_to': date_to,
+        'filter_query': filter_params.urlencode(),
         'status_choices': Order.ORDER_STATUS,
+        'cursor_pagination': cursor_pagination,
         'settings': settings,  # ✅ AGREGAR settings al contexto
         'title': 'Historial de Pedidos'
     }
@@ -127,7 +110,12 @@ def order_history_list(request):
 def order_detail_history(request, order_id):
     """Vista de detalle de un pedido específico"""
     
-    order = get_object_or_404(Order, pk=order_id, user=request.user)
+    settings = BusinessSettings.get_settings()
+    order = get_object_or_404(
+        _annotate_order_totals(Order.objects.prefetch_related('items__product'), settings),
+        pk=order_id,
+        user=request.user,
+    )
     if order.payment_method == 'wompi' and order.payment_status == 'pending':
         try:
             wompi_checkout_url = reverse('orders:wompi_checkout', args=[order.id])
@@ -141,32 +129,7 @@ def order_detail_history(request, order_id):
         order=order
     ).order_by('-created_at').first()
     
-    # ✅ CALCULAR totales correctos igual que en la lista
-    settings = BusinessSettings.get_settings()
-    
-    # Calcular subtotal de productos
-    items = order.items.all()
-    order.calculated_subtotal = sum(item.total_price for item in items)   
-    # Calcular costo de envío basado en configuración actual del negocio
-    if order.delivery_type == 'delivery':
-        if order.calculated_subtotal >= settings.free_delivery_threshold:
-            order.calculated_shipping = 0
-        else:
-            order.calculated_shipping = settings.delivery_cost
-    else:
-        order.calculated_shipping = 0
-    
-    # Calcular total final
-    order.calculated_total = order.calculated_subtotal + order.calculated_shipping
-    
-    # Verificar si califica para envío gratis
-    order.qualifies_for_free_shipping = (
-        order.delivery_type == 'delivery' and 
-        order.calculated_subtotal >= settings.free_delivery_threshold
-    )
-
-    # Verificar si se puede cancelar (24 horas antes)
-    order.can_be_cancelled = _can_cancel_order(order)
+    # ✅ Los totales (subtotal, envío, total, cancelable) vienen anotados en la consulta
 
     context = {
         'order': order,
@@ -177,6 +140,60 @@ def order_detail_history(request, order_id):
     
     return render(request, 'history/order_detail.html', context)
 
+def _annotate_order_totals(orders, settings):
+    """
+    Agrega al queryset los totales que muestra el historial, calculados en SQL:
+    subtotal de los items, costo de envío según la configuración actual del
+    negocio, total, envío gratis y si el pedido todavía se puede cancelar.
+    
+    Se puede aplicar sobre un queryset ya paginado (slice), de modo que solo
+    se calculan los pedidos visibles.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    
+    is_delivery = Q(delivery_type='delivery')
+    free_threshold = settings.free_delivery_threshold
+    
+    # Mismas reglas que _can_cancel_order, comparando fecha y hora por separado
+    cutoff = timezone.localtime() + timezone.timedelta(days=settings.cancellation_time_limit_days)
+    cancellable = (
+        ~Q(status__in=['cancelled', 'delivered', 'preparing', 'ready', 'in_delivery', 'modification_requested'])
+        & (
+            Q(desired_date__gt=cutoff.date())
+            | Q(desired_date=cutoff.date(), desired_time__gt=cutoff.time())
+        )
+    )
+    
+    return orders.annotate(
+        calculated_subtotal=Coalesce(
+            Subquery(items.annotate(total=Sum('total_price')).values('total'), output_field=money),
+            Value(Decimal('0')),
+            output_field=money,
+        ),
+        items_count=Coalesce(Subquery(items.annotate(count=Count('pk')).values('count')), Value(0)),
+    ).annotate(
+        qualifies_for_free_shipping=Case(
+            When(is_delivery & Q(calculated_subtotal__gte=free_threshold), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+        calculated_shipping=Case(
+            When(is_delivery & Q(calculated_subtotal__lt=free_threshold), then=Value(settings.delivery_cost)),
+            default=Value(Decimal('0')),
+            output_field=money,
+        ),
+        can_be_cancelled=Case(
+            When(cancellable, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    ).annotate(
+        calculated_total=ExpressionWrapper(
+            F('calculated_subtotal') + F('calculated_shipping'), output_field=money
+        ),
+    )
+
 def _can_cancel_order(order):
     """
     Función auxiliar para verificar si un pedido se puede cancelar.
@@ -7,6 +7,7 @@ from django.templatetags.static import static
 from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
 import os
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -124,6 +125,37 @@ else:
         }
     }
 
+# Cache en dos niveles: LRU en memoria de cada worker delante de una tabla de
+# cache en la base de datos compartida por todos (crear con createcachetable).
+# Las invalidaciones se propagan a los demás workers en SYNC_INTERVAL segundos.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'LOCATION': 'janay-local',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+            'LOCAL_TIMEOUT': int(os.environ.get('CACHE_LOCAL_TIMEOUT', '60')),
+            'SYNC_INTERVAL': float(os.environ.get('CACHE_SYNC_INTERVAL', '1')),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'janay_cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_SHARED_MAX_ENTRIES', '5000')),
+        },
+    },
+}
+
+# Cantidad de números de pedido que cada worker reserva por adelantado
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get('ORDER_NUMBER_BLOCK_SIZE', '5'))
+
+# Paginación por cursor en el historial de pedidos (también con ?pagination=cursor)
+HISTORY_CURSOR_PAGINATION = os.environ.get('HISTORY_CURSOR_PAGINATION', 'False') == 'True'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -190,11 +222,50 @@ SUPABASE_STORAGE = {
     "service_role_key": SUPABASE_SERVICE_ROLE_KEY,
     "bucket": SUPABASE_BUCKET,
     "base_path": "products",
+    # Cliente compartido por el proceso (products/supabase_client.py)
+    "timeout": float(os.environ.get('SUPABASE_TIMEOUT', '30')),
+    "connect_timeout": float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', '5')),
+    "pool_size": int(os.environ.get('SUPABASE_POOL_SIZE', '10')),
+    "max_retries": int(os.environ.get('SUPABASE_MAX_RETRIES', '2')),
 }
 
 if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY:
     DEFAULT_FILE_STORAGE = "products.supabase_storage.SupabaseStorage"
 
+# Storage de las imágenes de productos. Sin Supabase (desarrollo, pruebas):
+# PRODUCT_IMAGE_STORAGE=products.storage.LocalImageStorage guarda en MEDIA_ROOT
+PRODUCT_IMAGE_STORAGE = os.environ.get(
+    'PRODUCT_IMAGE_STORAGE', 'products.supabase_storage.SupabaseStorage'
+)
+# Llaves por hash del contenido: subir la misma imagen o duplicar un producto
+# solo suma una referencia (products.models.StoredImage)
+PRODUCT_IMAGE_DEDUPLICATE = os.environ.get('PRODUCT_IMAGE_DEDUPLICATE', 'True') == 'True'
+# Segundos de latencia simulada por operación en LocalImageStorage (benchmarks)
+LOCAL_IMAGE_STORAGE_LATENCY = float(os.environ.get('LOCAL_IMAGE_STORAGE_LATENCY', '0'))
+# Imágenes por llamada remove([...]) al borrar productos en lote (cada una
+# son 4 objetos con sus tamaños derivados; Supabase acepta hasta 1000)
+PRODUCT_IMAGE_DELETE_BATCH_SIZE = int(os.environ.get('PRODUCT_IMAGE_DELETE_BATCH_SIZE', '100'))
+# Megapíxeles máximos de una imagen subida: se rechaza antes de decodificarla
+# (una de 40 MP en PNG ocupa ~120 MB ya decodificada)
+PRODUCT_IMAGE_MAX_MEGAPIXELS = int(os.environ.get('PRODUCT_IMAGE_MAX_MEGAPIXELS', '40'))
+# Formatos en que se guardan los tamaños derivados (WebP siempre); se
+# ofrecen con <picture> y /img/ elige según el header Accept
+PRODUCT_IMAGE_FORMATS = os.environ.get('PRODUCT_IMAGE_FORMATS', 'avif,webp,jpeg').split(',')
+# Perfil del codificador (fast, balanced, max-compression) por contexto: la
+# imagen subida en el admin (worker), /img/ (en el request) y la
+# regeneración de imágenes ya guardadas
+PRODUCT_IMAGE_ENCODER_PROFILES = {
+    'upload': os.environ.get('PRODUCT_IMAGE_UPLOAD_PROFILE', 'balanced'),
+    'resize': os.environ.get('PRODUCT_IMAGE_RESIZE_PROFILE', 'fast'),
+    'regenerate': os.environ.get('PRODUCT_IMAGE_REGENERATE_PROFILE', 'max-compression'),
+}
+# Cache en disco de /img/ (imágenes redimensionadas al vuelo): al pasar el
+# tope se borran las variantes usadas hace más tiempo
+PRODUCT_IMAGE_CACHE_DIR = os.environ.get(
+    'PRODUCT_IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'janaypedidos-img')
+)
+PRODUCT_IMAGE_CACHE_MAX_MB = int(os.environ.get('PRODUCT_IMAGE_CACHE_MAX_MB', '200'))
+
 # Security settings para producción
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import RedirectView
 from core.views import WelcomeView  
+from products.views import image_proxy
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -26,6 +27,8 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('products/', include('products.urls')),
     path('orders/', include('orders.urls')),  
+    # Imágenes de productos redimensionadas al vuelo (?w=ancho&q=calidad)
+    path('img/<path:key>', image_proxy, name='image_proxy'),
     # path('notifications/', include('notifications.urls')),  # Si planeas usarla
     
     # Desarrollo
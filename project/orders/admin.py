@@ -4,6 +4,7 @@ from django.urls import reverse
 from django.utils import timezone
 from unfold.admin import ModelAdmin
 from .models import Order, OrderItem, OrderModificationRequest, BusinessSettings
+from .services import search_orders
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -84,6 +85,12 @@ class OrderAdmin(ModelAdmin):
             return qs
         return qs.exclude(payment_status="cancelled")
 
+    def get_search_results(self, request, queryset, search_term):
+        """Usar el índice de búsqueda de pedidos en lugar de icontains sobre cada columna"""
+        if not search_term:
+            return queryset, False
+        return search_orders(queryset, search_term, ranked=False), False
+
 @admin.register(OrderItem)
 class OrderItemAdmin(ModelAdmin):
     list_display = ('order_number', 'product', 'quantity', 'unit_price', 'total_price')
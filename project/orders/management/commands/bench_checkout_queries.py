@@ -0,0 +1,94 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Cuenta las consultas SQL y el tiempo de los pasos 2 y 3 del pedido '
+        '(GET y POST) con un carrito de N productos, como lo haría el navegador '
+        'de un usuario con sesión. El pedido que crea el paso 3 se borra al terminar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Usuario con el que se recorre el pedido')
+        parser.add_argument('--products', type=int, default=20,
+                            help='Productos distintos en el carrito (por defecto 20)')
+        parser.add_argument('--quantity', type=int, default=3,
+                            help='Unidades de cada producto (por defecto 3)')
+        parser.add_argument('--delivery-type', choices=['pickup', 'delivery'], default='pickup')
+        parser.add_argument('--sql', action='store_true',
+                            help='Muestra las consultas de cada paso')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No existe el usuario {options['username']}")
+        product_ids = list(
+            Product.objects.filter(is_available=True).order_by('pk')
+            .values_list('pk', flat=True)[:options['products']]
+        )
+        if not product_ids:
+            raise CommandError('No hay productos disponibles')
+
+        desired = timezone.localtime() + timedelta(days=2)
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session['order_cart'] = {'order_info': {
+            'delivery_type': options['delivery_type'],
+            'customer_name': user.get_full_name() or user.username,
+            'customer_phone': '3000000000',
+            'customer_email': user.email,
+            'desired_date': desired.strftime('%Y-%m-%d'),
+            'desired_time': '10:00',
+            'delivery_address': 'Calle de prueba 1',
+            'delivery_neighborhood': 'Centro',
+            'delivery_references': '',
+        }}
+        session.save()
+
+        cart = {f'product_{pk}': str(options['quantity']) for pk in product_ids}
+        steps = [
+            ('Paso 2 GET', 'get', 'orders:step2', {}),
+            ('Paso 2 POST', 'post', 'orders:step2', cart),
+            ('Paso 3 GET', 'get', 'orders:step3', {}),
+            ('Paso 3 POST', 'post', 'orders:step3', {}),
+        ]
+        self.stdout.write(f"Carrito de {len(product_ids)} productos × {options['quantity']} unidades")
+
+        last_order = Order.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for label, method, url_name, data in steps:
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = getattr(client, method)(reverse(url_name), data)
+                        elapsed = (time.perf_counter() - started) * 1000
+                    self._report(label, response, queries.captured_queries, elapsed, options['sql'])
+        finally:
+            # Solo los pedidos de este usuario creados durante la medición
+            Order.objects.filter(user=user, pk__gt=last_order).delete()
+
+    def _report(self, label, response, queries, elapsed, show_sql):
+        repeated = sum(count - 1 for count in Counter(q['sql'] for q in queries).values() if count > 1)
+        location = f" → {response.url}" if response.status_code in (301, 302) else ''
+        self.stdout.write(
+            f"{label}: {response.status_code}{location}, {len(queries)} consultas "
+            f"({repeated} repetidas), {elapsed:.0f} ms"
+        )
+        if show_sql:
+            for query in queries:
+                self.stdout.write(f"    {query['sql']}")
@@ -0,0 +1,134 @@
+import random
+import statistics
+import time
+import unicodedata
+from datetime import date, time as day_time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from orders.models import Order
+from orders.services.search import SEARCH_SOURCE_FIELDS, build_search_document, search_orders
+
+# Pedidos sembrados: número propio para no chocar con el consecutivo JY…
+BENCH_PREFIX = 'BENCH'
+BENCH_USERNAME = 'bench_order_search'
+
+FIRST_NAMES = [
+    'María', 'José', 'Luis', 'Ana', 'Carlos', 'Sofía', 'Andrés', 'Valentina', 'Jorge',
+    'Camila', 'Julián', 'Daniela', 'Sebastián', 'Lucía', 'Martín', 'Isabel', 'Tomás',
+    'Paula', 'Héctor', 'Natalia',
+]
+LAST_NAMES = [
+    'Gómez', 'Rodríguez', 'Martínez', 'López', 'García', 'Pérez', 'Sánchez', 'Ramírez',
+    'Torres', 'Díaz', 'Vargas', 'Castro', 'Rojas', 'Muñoz', 'Ortiz', 'Jiménez', 'Herrera',
+    'Medina', 'Suárez', 'Córdoba',
+]
+DEFAULT_QUERIES = ['gomez', 'Muñoz', 'maria lopez', '300 12', 'BENCH000000123', 'zzzz']
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _ascii(text):
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+
+
+def icontains_search(queryset, query):
+    """La búsqueda anterior al índice: cada término en alguno de los campos"""
+    for term in query.split():
+        condition = Q()
+        for field in SEARCH_SOURCE_FIELDS:
+            condition |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(condition)
+    return queryset.order_by('-created_at')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la búsqueda de pedidos con icontains sobre los campos contra la '
+        'búsqueda indexada (trigramas en PostgreSQL, FTS5 en SQLite). Siembra N '
+        'pedidos dentro de una transacción que se revierte al terminar y mide, '
+        'por consulta, el COUNT más la primera página como lo hace el historial'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*',
+                            help=f"Búsquedas a medir (por defecto: {', '.join(DEFAULT_QUERIES)})")
+        parser.add_argument('--orders', type=int, default=100_000,
+                            help='Pedidos a sembrar (por defecto 100000)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Veces que se mide cada consulta; se informa la mediana')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos sembrados')
+        parser.add_argument('--keep', action='store_true',
+                            help='Confirma los pedidos sembrados en vez de revertirlos')
+
+    def handle(self, *args, **options):
+        if options['orders'] < 1 or options['repeat'] < 1:
+            raise CommandError('--orders y --repeat deben ser mayores que 0')
+        if Order.objects.filter(order_number__startswith=BENCH_PREFIX).exists():
+            raise CommandError(f'Ya hay pedidos {BENCH_PREFIX}… de una corrida con --keep; bórralos antes')
+
+        try:
+            with transaction.atomic():
+                self._seed(options)
+                self._measure(options['queries'] or DEFAULT_QUERIES, options['repeat'])
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write('Pedidos sembrados revertidos')
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+        user, _ = get_user_model().objects.get_or_create(username=BENCH_USERNAME)
+        started = time.perf_counter()
+        total = options['orders']
+        for start in range(0, total, options['batch_size']):
+            batch = []
+            for index in range(start, min(start + options['batch_size'], total)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                order = Order(
+                    user=user,
+                    order_number=f'{BENCH_PREFIX}{index:09d}',
+                    status=rng.choice(['pending', 'confirmed', 'delivered']),
+                    delivery_type='pickup',
+                    customer_name=f'{first} {last} {rng.choice(LAST_NAMES)}',
+                    customer_phone=f'3{rng.randrange(10**9):09d}',
+                    customer_email=f'{_ascii(first)}.{_ascii(last)}{index}@example.com',
+                    desired_date=date(2025, 1, 1),
+                    desired_time=day_time(10, 0),
+                )
+                # ``bulk_create`` no pasa por ``save``
+                order.search_document = build_search_document(order)
+                batch.append(order)
+            Order.objects.bulk_create(batch)
+        self.stdout.write(
+            f"{total} pedidos sembrados en {time.perf_counter() - started:.1f} s "
+            f"({connection.vendor})"
+        )
+
+    def _measure(self, queries, repeat):
+        orders = Order.objects.all()
+        strategies = [
+            ('icontains', lambda query: icontains_search(orders, query)),
+            ('índice', lambda query: search_orders(orders, query)),
+            ('índice sin rank', lambda query: search_orders(orders, query, ranked=False).order_by('-created_at')),
+        ]
+        for query in queries:
+            self.stdout.write(f"«{query}»")
+            for label, search in strategies:
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    queryset = search(query)
+                    count = queryset.count()
+                    list(queryset[:10])
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f"  {label:<16} {count:>7} resultados  mediana {statistics.median(timings):8.1f} ms  "
+                    f"máx {max(timings):8.1f} ms"
+                )
@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from orders.models import OrderNumberSequence
+from orders.services.order_numbers import ORDER_NUMBER_MAX, OrderNumberAllocator
+
+# Un día sin pedidos reales: la fila de su consecutivo se borra al terminar
+STRESS_DAY = date(2099, 12, 31)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de concurrencia del consecutivo de números de pedido: varios '
+        'asignadores (uno por worker simulado) piden números desde varios hilos, '
+        'algunos dentro de transacciones que se confirman y otros en '
+        'transacciones que se revierten. Falla si un número confirmado se repite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Hilos que piden números (por defecto 8)')
+        parser.add_argument('--allocators', type=int, default=4,
+                            help='Asignadores, cada uno como un worker distinto (por defecto 4)')
+        parser.add_argument('--numbers', type=int, default=50,
+                            help='Números que pide cada hilo (por defecto 50)')
+        parser.add_argument('--block-size', type=int, default=5,
+                            help='Consecutivos por bloque reservado (por defecto 5)')
+        parser.add_argument('--rollback-ratio', type=float, default=0.2,
+                            help='Fracción de pedidos dentro de una transacción que se revierte')
+        parser.add_argument('--seed', type=int, help='Semilla para repetir una corrida')
+
+    def handle(self, *args, **options):
+        total = options['threads'] * options['numbers']
+        if total > ORDER_NUMBER_MAX // 2:
+            raise CommandError('Demasiados números para un solo día; baja --threads o --numbers')
+
+        OrderNumberSequence.objects.filter(day=STRESS_DAY).delete()
+        allocators = [OrderNumberAllocator(options['block_size']) for _ in range(options['allocators'])]
+        committed, rolled_back, errors = [], [], []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+
+        def worker(index):
+            rng = random.Random(None if options['seed'] is None else options['seed'] + index)
+            allocator = allocators[index % len(allocators)]
+            start.wait()
+            try:
+                for _ in range(options['numbers']):
+                    mode = rng.random()
+                    if mode < options['rollback_ratio']:
+                        # Un pedido que falla después de tomar su número
+                        try:
+                            with transaction.atomic():
+                                number = allocator.allocate(STRESS_DAY)
+                                raise _Rollback
+                        except _Rollback:
+                            with lock:
+                                rolled_back.append(number)
+                        continue
+                    if mode < 0.5 + options['rollback_ratio'] / 2:
+                        # Como un pedido creado desde el admin (dentro de una transacción)
+                        with transaction.atomic():
+                            number = allocator.allocate(STRESS_DAY)
+                    else:
+                        number = allocator.allocate(STRESS_DAY)
+                    with lock:
+                        committed.append(number)
+            except Exception as exc:
+                with lock:
+                    errors.append(exc)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        OrderNumberSequence.objects.filter(day=STRESS_DAY).delete()
+
+        duplicates = sorted(number for number, count in Counter(committed).items() if count > 1)
+        self.stdout.write(
+            f"{len(committed)} números confirmados y {len(rolled_back)} revertidos en "
+            f"{elapsed:.2f} s ({options['threads']} hilos, {options['allocators']} asignadores, "
+            f"bloques de {options['block_size']})"
+        )
+        if errors:
+            raise CommandError(f"{len(errors)} hilos fallaron: {errors[0]!r}")
+        if duplicates:
+            raise CommandError(
+                f"{len(duplicates)} números confirmados repetidos: {', '.join(duplicates[:10])}"
+            )
+        self.stdout.write(self.style.SUCCESS('Sin números repetidos'))
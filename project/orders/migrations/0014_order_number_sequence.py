@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_alter_order_payment_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='Día')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Último consecutivo reservado')),
+            ],
+            options={
+                'verbose_name': 'Consecutivo de pedidos',
+                'verbose_name_plural': 'Consecutivos de pedidos',
+            },
+        ),
+    ]
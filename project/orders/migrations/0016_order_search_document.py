@@ -0,0 +1,102 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:33
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Copias congeladas de orders.services.search: la migración no debe cambiar
+# si después cambia el código de la aplicación
+SQLITE_FTS_TABLE = 'orders_order_fts'
+SEARCH_SOURCE_FIELDS = ('order_number', 'customer_name', 'customer_phone', 'customer_email')
+
+
+def normalize_search_text(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def build_search_document(order):
+    parts = [getattr(order, field) or '' for field in SEARCH_SOURCE_FIELDS]
+    phone_digits = re.sub(r'\D+', '', order.customer_phone or '')
+    if phone_digits:
+        parts.append(phone_digits)
+    return normalize_search_text(' '.join(parts))
+
+
+def fill_search_document(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    orders = Order.objects.using(schema_editor.connection.alias).only(
+        'id', 'order_number', 'customer_name', 'customer_phone', 'customer_email'
+    )
+    batch = []
+    for order in orders.iterator(chunk_size=2000):
+        order.search_document = build_search_document(order)
+        batch.append(order)
+        if len(batch) >= 2000:
+            Order.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS orders_order_search_trgm '
+            'ON orders_order USING gin (search_document gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        # Tabla FTS5 con contenido externo, sincronizada con triggers
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+            f"search_document, content='orders_order', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON orders_order BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON orders_order BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_document) "
+            f"VALUES ('delete', old.id, old.search_document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE OF search_document ON orders_order BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_document) "
+            f"VALUES ('delete', old.id, old.search_document); "
+            f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS orders_order_search_trgm')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_order_user_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Documento de búsqueda'),
+        ),
+        migrations.RunPython(fill_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
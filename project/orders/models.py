@@ -1,12 +1,19 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import cache
+from django.core.signals import request_started
 from django.contrib.auth.models import User
+from core.cache import settings_cache
 from products.models import Product
+from .services.pricing import parse_cart
+from .services.search import SEARCH_SOURCE_FIELDS, build_search_document
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
-import random
-import string
+import time
 from datetime import datetime
 from django.utils import timezone
         
@@ -89,31 +96,37 @@ class Order(models.Model):
     notes = models.TextField(blank=True, verbose_name='Notas del cliente')
     admin_notes = models.TextField(blank=True, verbose_name='Notas del administrador')
     
+    # Documento normalizado para la búsqueda indexada (ver services.search)
+    search_document = models.TextField(blank=True, default='', editable=False, verbose_name='Documento de búsqueda')
+    
     class Meta:
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-created_at']
+        indexes = [
+            # Paginación por cursor del historial: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.order_number:
             self.order_number = self.generate_order_number()
+        
+        # Mantener actualizado el documento de búsqueda
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.search_document = build_search_document(self)
+        elif set(update_fields) & set(SEARCH_SOURCE_FIELDS):
+            self.search_document = build_search_document(self)
+            kwargs['update_fields'] = set(update_fields) | {'search_document'}
         super().save(*args, **kwargs)
     
     def generate_order_number(self):
         """Genera un número único para el pedido"""
 
-        # Formato: JY + YYYYMMDD + NNNN (4 dígitos aleatorios)
-        date_part = datetime.now().strftime('%Y%m%d')  # 8 dígitos: 20250804
-        random_part = ''.join(random.choices(string.digits, k=4))  # 4 dígitos
-        
-        order_number = f"JY{date_part}{random_part}"  # JY20250804NNNN = 14 dígitos
-        
-        # Verificar si ya existe
-        while Order.objects.filter(order_number=order_number).exists():
-            random_part = ''.join(random.choices(string.digits, k=4))
-            order_number = f"JY{date_part}{random_part}"
-        
-        return order_number
+        # Formato: JY + YYYYMMDD + NNNN (consecutivo diario, ver services.order_numbers)
+        from .services.order_numbers import allocate_order_number
+        return allocate_order_number()
     
     def __str__(self):
         return f"{self.order_number} - {self.customer_name} ({self.get_status_display()})"
@@ -194,7 +207,46 @@ class Order(models.Model):
     
     def calculate_total(self):
         """Calcular el total basado en los items"""
-        self.subtotal = sum(item.total_price for item in self.items.all())
+        subtotal = self.items.aggregate(total=Sum('total_price'))['total']
+        self._apply_totals(subtotal or Decimal('0'))
+        self._save_totals()
+    
+    def set_items(self, quantities, products=None):
+        """
+        Reemplaza los items del pedido a partir de un diccionario {product_id: cantidad}.
+        
+        Los precios salen de una sola consulta de productos (o del diccionario
+        `products` si ya se tienen cargados), los items se crean con bulk_create
+        y los totales se calculan una sola vez, todo dentro de una transacción.
+        """
+        cleaned = parse_cart(quantities)
+        
+        if products is None:
+            products = Product.objects.in_bulk(list(cleaned))
+        
+        items = []
+        for product_id, quantity in cleaned.items():
+            product = products.get(product_id)
+            if product is None:
+                continue
+            items.append(OrderItem(
+                order=self,
+                product=product,
+                quantity=quantity,
+                unit_price=product.price,
+                total_price=product.price * quantity,
+            ))
+        
+        with transaction.atomic():
+            self.items.all().delete()
+            OrderItem.objects.bulk_create(items)
+            self._apply_totals(sum((item.total_price for item in items), Decimal('0')))
+            self._save_totals()
+        return items
+    
+    def _apply_totals(self, subtotal):
+        """Asigna subtotal, costo de envío y total a partir del subtotal de los items"""
+        self.subtotal = subtotal
         
         if self.delivery_type == 'delivery':
             self.delivery_fee = self.calculate_delivery_fee()
@@ -202,7 +254,12 @@ class Order(models.Model):
             self.delivery_fee = Decimal('0')
             
         self.total = self.subtotal + self.delivery_fee
-        self.save()
+    
+    def _save_totals(self):
+        if self.pk:
+            self.save(update_fields=['subtotal', 'delivery_fee', 'total', 'updated_at'])
+        else:
+            self.save()
     
     def get_delivery_time_slots(self):
         """Obtiene los horarios disponibles para entrega (5am - 9pm)"""
@@ -213,6 +270,19 @@ class Order(models.Model):
         return slots
 
 
+class OrderNumberSequence(models.Model):
+    """Contador diario usado para asignar los números de pedido"""
+    day = models.DateField(unique=True, verbose_name='Día')
+    last_value = models.PositiveIntegerField(default=0, verbose_name='Último consecutivo reservado')
+    
+    class Meta:
+        verbose_name = 'Consecutivo de pedidos'
+        verbose_name_plural = 'Consecutivos de pedidos'
+    
+    def __str__(self):
+        return f"{self.day:%Y%m%d} - {self.last_value}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE, verbose_name='Pedido')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Producto')
@@ -234,6 +304,13 @@ class OrderItem(models.Model):
         # Actualizar total del pedido
         self.order.calculate_total()
     
+    def delete(self, *args, **kwargs):
+        order = self.order
+        result = super().delete(*args, **kwargs)
+        # Mantener el total consistente al quitar items (p. ej. desde el inline del admin)
+        order.calculate_total()
+        return result
+    
     def __str__(self):
         return f"{self.product.name} x{self.quantity} - ${self.total_price:,.0f}"
     
@@ -386,7 +463,36 @@ class BusinessSettings(models.Model):
     
     @classmethod
     def get_settings(cls):
-        """Obtiene la configuración del negocio, crea una por defecto si no existe"""
+        """
+        Obtiene la configuración del negocio, crea una por defecto si no existe.
+
+        Usa dos niveles de cache: una copia en memoria del proceso y el cache
+        compartido de Django, ambos indexados por la versión de la configuración.
+        La versión se consulta como máximo una vez por request, así que todas las
+        llamadas de un mismo request comparten una sola consulta.
+        """
+        local = _settings_local
+        now = time.monotonic()
+        if local['instance'] is not None and now < local['valid_until']:
+            return local['instance']
+
+        version = settings_cache.generation()
+
+        if local['instance'] is None or local['version'] != version:
+            instance_key = settings_cache.key('instance', generation=version)
+            instance = cache.get(instance_key)
+            if instance is None:
+                instance = cls._load_settings()
+                cache.set(instance_key, instance, settings_cache.timeout)
+            local['instance'] = instance
+            local['version'] = version
+
+        local['valid_until'] = now + SETTINGS_LOCAL_TTL
+        return local['instance']
+
+    @classmethod
+    def _load_settings(cls):
+        """Lee la configuración desde la base de datos"""
         settings = cls.objects.first()
         if not settings:
             # Crear configuración por defecto
@@ -403,3 +509,36 @@ class BusinessSettings(models.Model):
                 accept_wompi=True,
             )
         return settings
+
+
+# Cache de BusinessSettings: la versión es la generación del namespace
+# ``settings_cache`` y cada proceso guarda su propia copia de la instancia
+# para la versión que conoce.
+# Fuera de un request (shell, comandos) la versión se revalida cada pocos segundos
+SETTINGS_LOCAL_TTL = 5
+
+_settings_local = {'version': None, 'instance': None, 'valid_until': 0.0}
+
+
+def _expire_local_settings():
+    _settings_local['valid_until'] = 0.0
+
+
+@receiver(request_started)
+def revalidate_settings_per_request(sender, **kwargs):
+    """Cada request vuelve a comprobar la versión de la configuración una vez"""
+    _expire_local_settings()
+
+
+@receiver([post_save, post_delete], sender=BusinessSettings)
+def invalidate_settings_cache(sender, using=None, **kwargs):
+    """Incrementa la versión para que todos los workers recarguen la configuración"""
+    # Al confirmar: un ``get_settings()`` concurrente cachearía la fila vieja
+    # con la versión nueva
+    transaction.on_commit(_bump_settings_version, using=using)
+
+
+def _bump_settings_version():
+    settings_cache.bump()
+    _settings_local['instance'] = None
+    _expire_local_settings()
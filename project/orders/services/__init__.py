@@ -1,5 +1,22 @@
 """Servicios y utilidades para integraciones externas del módulo de pedidos."""
 
+from .order_numbers import (
+    OrderNumberAllocator,
+    OrderNumberExhausted,
+    allocate_order_number,
+    format_order_number,
+)
+from .pricing import (
+    CartQuote,
+    QuoteLine,
+    parse_cart,
+    quote_cart,
+)
+from .search import (
+    build_search_document,
+    normalize_search_text,
+    search_orders,
+)
 from .wompi import (
     WompiAPIError,
     get_acceptance_information,
@@ -9,6 +26,17 @@ from .wompi import (
 )
 
 __all__ = [
+    'CartQuote',
+    'QuoteLine',
+    'parse_cart',
+    'quote_cart',
+    'build_search_document',
+    'normalize_search_text',
+    'search_orders',
+    'OrderNumberAllocator',
+    'OrderNumberExhausted',
+    'allocate_order_number',
+    'format_order_number',
     'WompiAPIError',
     'get_acceptance_information',
     'get_transaction_information',
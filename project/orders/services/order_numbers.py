@@ -0,0 +1,140 @@
+"""Asignación de números de pedido a partir de un consecutivo diario."""
+
+from __future__ import annotations
+
+import threading
+from functools import partial
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+ORDER_NUMBER_PREFIX = 'JY'
+ORDER_NUMBER_DIGITS = 4
+ORDER_NUMBER_MAX = 10 ** ORDER_NUMBER_DIGITS - 1
+
+
+class OrderNumberExhausted(Exception):
+    """Se agotaron los consecutivos disponibles para el día."""
+
+
+class OrderNumberAllocator:
+    """
+    Entrega números ``JY + YYYYMMDD + NNNN`` sin consultar si ya existen.
+
+    Cada proceso reserva de forma atómica un bloque de consecutivos en la fila
+    ``OrderNumberSequence`` del día y luego los va entregando desde memoria, así
+    que la mayoría de los pedidos no necesitan ninguna consulta adicional. Los
+    bloques no se solapan entre workers, por lo que no hay colisiones; un worker
+    que se reinicia solo deja huecos en la numeración.
+
+    Si el llamador ya está dentro de una transacción, la reserva es solo un
+    savepoint: al revertirse, el contador de la base vuelve atrás y otro
+    worker recibiría el mismo rango. Por eso ese bloque se usa para un solo
+    número y el resto pasa a memoria únicamente cuando la transacción se
+    confirma.
+    """
+
+    def __init__(self, block_size: Optional[int] = None):
+        self.block_size = max(1, block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 5))
+        self._lock = threading.Lock()
+        # día -> (siguiente consecutivo libre, último consecutivo del bloque)
+        self._blocks: Dict[date, Tuple[int, int]] = {}
+
+    def allocate(self, day: Optional[date] = None) -> str:
+        day = day or datetime.now().date()
+        with self._lock:
+            next_value, last_value = self._blocks.get(day, (1, 0))
+            if next_value > last_value:
+                next_value, last_value = self._reserve_block(day)
+                # Los bloques de días anteriores ya no se usarán
+                self._blocks = {}
+                if transaction.get_connection().in_atomic_block:
+                    transaction.on_commit(partial(self._keep_block, day, next_value + 1, last_value))
+                    return format_order_number(day, next_value)
+            self._blocks[day] = (next_value + 1, last_value)
+        return format_order_number(day, next_value)
+
+    def _keep_block(self, day: date, next_value: int, last_value: int) -> None:
+        """Guarda el resto de un bloque reservado en una transacción ya confirmada."""
+        with self._lock:
+            current_next, current_last = self._blocks.get(day, (1, 0))
+            if current_next > current_last:
+                self._blocks[day] = (next_value, last_value)
+
+    def _reserve_block(self, day: date) -> Tuple[int, int]:
+        from ..models import OrderNumberSequence
+
+        with transaction.atomic():
+            # El UPDATE va primero para tomar el bloqueo de escritura de inmediato
+            sequence = OrderNumberSequence.objects.filter(day=day)
+            updated = sequence.update(last_value=F('last_value') + self.block_size)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        OrderNumberSequence.objects.create(
+                            day=day,
+                            last_value=_highest_existing_value(day) + self.block_size,
+                        )
+                except IntegrityError:
+                    # Otro worker creó la fila del día al mismo tiempo
+                    sequence.update(last_value=F('last_value') + self.block_size)
+            last_value = sequence.values_list('last_value', flat=True).get()
+
+        first_value = last_value - self.block_size + 1
+        if first_value > ORDER_NUMBER_MAX:
+            raise OrderNumberExhausted(
+                f'Se agotaron los números de pedido para el día {day:%Y-%m-%d}.'
+            )
+        return first_value, min(last_value, ORDER_NUMBER_MAX)
+
+    def reset(self) -> None:
+        """Descarta los bloques reservados en este proceso."""
+        with self._lock:
+            self._blocks = {}
+
+
+def format_order_number(day: date, value: int) -> str:
+    """Construye el número de pedido para el día y consecutivo indicados."""
+
+    return f"{ORDER_NUMBER_PREFIX}{day:%Y%m%d}{value:0{ORDER_NUMBER_DIGITS}d}"
+
+
+def _highest_existing_value(day: date) -> int:
+    """
+    Consecutivo más alto ya usado en el día.
+
+    Solo se consulta al crear la fila del día, para no chocar con los números
+    aleatorios que se asignaban antes de existir el consecutivo.
+    """
+
+    from ..models import Order
+
+    prefix = f"{ORDER_NUMBER_PREFIX}{day:%Y%m%d}"
+    existing = (
+        Order.objects.filter(order_number__startswith=prefix)
+        .order_by('-order_number')
+        .values_list('order_number', flat=True)
+        .first()
+    )
+    suffix = (existing or '')[len(prefix):]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+_allocator = OrderNumberAllocator()
+
+
+def allocate_order_number(day: Optional[date] = None) -> str:
+    """Devuelve un número de pedido nuevo usando el asignador del proceso."""
+
+    return _allocator.allocate(day)
+
+
+__all__ = [
+    'OrderNumberAllocator',
+    'OrderNumberExhausted',
+    'allocate_order_number',
+    'format_order_number',
+]
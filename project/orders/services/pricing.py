@@ -0,0 +1,109 @@
+"""Cotización del carrito de compras con una sola consulta de productos."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Mapping, Optional
+
+from products.models import Product
+
+
+@dataclass(frozen=True)
+class QuoteLine:
+    """Una línea del carrito ya valorizada."""
+
+    product: Product
+    quantity: int
+    unit_price: Decimal
+    line_total: Decimal
+
+
+@dataclass
+class CartQuote:
+    """Resultado de cotizar un carrito ``{product_id: cantidad}``."""
+
+    lines: List[QuoteLine] = field(default_factory=list)
+    subtotal: Decimal = Decimal('0')
+    delivery_fee: Decimal = Decimal('0')
+    free_delivery: bool = False
+    minimum_order_amount: Decimal = Decimal('0')
+    minimum_shortfall: Decimal = Decimal('0')
+    unavailable: List[int] = field(default_factory=list)
+
+    @property
+    def total(self) -> Decimal:
+        return self.subtotal + self.delivery_fee
+
+    @property
+    def meets_minimum(self) -> bool:
+        return self.minimum_shortfall <= 0
+
+    @property
+    def quantities(self) -> Dict[int, int]:
+        return {line.product.id: line.quantity for line in self.lines}
+
+    @property
+    def products(self) -> Dict[int, Product]:
+        return {line.product.id: line.product for line in self.lines}
+
+
+def parse_cart(cart: Mapping) -> Dict[int, int]:
+    """Normaliza un carrito de la sesión (llaves y cantidades como texto)."""
+
+    cleaned: Dict[int, int] = {}
+    for product_id, quantity in (cart or {}).items():
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            cleaned[product_id] = quantity
+    return cleaned
+
+
+def quote_cart(
+    cart: Mapping,
+    *,
+    delivery_type: Optional[str] = None,
+    settings=None,
+) -> CartQuote:
+    """
+    Valoriza el carrito con una única consulta ``in_bulk`` de productos.
+
+    Los productos que ya no existen o no están disponibles se excluyen de las
+    líneas y se reportan en ``unavailable``. El costo de envío solo se calcula
+    cuando ``delivery_type`` es ``'delivery'``.
+    """
+
+    if settings is None:
+        from ..models import BusinessSettings
+
+        settings = BusinessSettings.get_settings()
+
+    quantities = parse_cart(cart)
+    products = Product.objects.select_related('category').in_bulk(list(quantities))
+
+    quote = CartQuote(minimum_order_amount=settings.minimum_order_amount)
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or not product.is_available:
+            quote.unavailable.append(product_id)
+            continue
+        line_total = product.price * quantity
+        quote.lines.append(QuoteLine(product, quantity, product.price, line_total))
+        quote.subtotal += line_total
+
+    quote.free_delivery = quote.subtotal >= settings.free_delivery_threshold
+    if delivery_type == 'delivery' and not quote.free_delivery:
+        quote.delivery_fee = settings.delivery_cost
+    quote.minimum_shortfall = max(settings.minimum_order_amount - quote.subtotal, Decimal('0'))
+    return quote
+
+
+__all__ = [
+    'CartQuote',
+    'QuoteLine',
+    'parse_cart',
+    'quote_cart',
+]
@@ -0,0 +1,148 @@
+"""Búsqueda indexada de pedidos sobre un documento de búsqueda normalizado."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Iterable, List
+
+from django.db import connection
+from django.db.models import FloatField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+# Campos del pedido que forman el documento de búsqueda
+SEARCH_SOURCE_FIELDS = ('order_number', 'customer_name', 'customer_phone', 'customer_email')
+
+# Tabla FTS5 (solo SQLite) creada por la migración 0016
+SQLITE_FTS_TABLE = 'orders_order_fts'
+
+# El índice de trigramas solo sirve para términos de 3 caracteres o más
+MIN_INDEXED_TERM_LENGTH = 3
+
+
+def normalize_search_text(text: str) -> str:
+    """Minúsculas, sin tildes y con espacios simples."""
+
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def build_search_document(order) -> str:
+    """Construye el documento de búsqueda de un pedido."""
+
+    parts: List[str] = [getattr(order, field) or '' for field in SEARCH_SOURCE_FIELDS]
+    # El teléfono también se indexa solo con dígitos ("300 123" -> "300123")
+    phone_digits = re.sub(r'\D+', '', order.customer_phone or '')
+    if phone_digits:
+        parts.append(phone_digits)
+    return normalize_search_text(' '.join(parts))
+
+
+def search_terms(query: str) -> List[str]:
+    return normalize_search_text(query).split()
+
+
+def search_orders(queryset: QuerySet, query: str, *, ranked: bool = True) -> QuerySet:
+    """
+    Filtra ``queryset`` por ``query`` usando el índice de búsqueda de pedidos.
+
+    Todos los términos deben aparecer (como subcadena) en el documento. En
+    PostgreSQL se apoya en el índice GIN de trigramas y ordena por
+    ``word_similarity``; en SQLite usa la tabla FTS5 con tokenizador de
+    trigramas y ordena por ``bm25``. Con ``ranked=True`` el resultado queda
+    ordenado por relevancia y luego por fecha, y trae la anotación
+    ``search_rank``.
+    """
+
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        return _search_postgresql(queryset, terms, ranked)
+    if vendor == 'sqlite' and _sqlite_fts_available():
+        return _search_sqlite(queryset, terms, ranked)
+    return _search_fallback(queryset, terms, ranked)
+
+
+def _contains_all(terms: Iterable[str]) -> Q:
+    condition = Q()
+    for term in terms:
+        condition &= Q(search_document__contains=term)
+    return condition
+
+
+def _search_postgresql(queryset: QuerySet, terms: List[str], ranked: bool) -> QuerySet:
+    # LIKE '%term%' usa el índice GIN (gin_trgm_ops) sobre search_document
+    queryset = queryset.filter(_contains_all(terms))
+    if not ranked:
+        return queryset
+
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    return queryset.annotate(
+        search_rank=TrigramWordSimilarity(Value(' '.join(terms)), 'search_document')
+    ).order_by('-search_rank', '-created_at')
+
+
+def _search_sqlite(queryset: QuerySet, terms: List[str], ranked: bool) -> QuerySet:
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM_LENGTH]
+    short = [term for term in terms if len(term) < MIN_INDEXED_TERM_LENGTH]
+
+    if short:
+        queryset = queryset.filter(_contains_all(short))
+    if not indexed:
+        return _rank_by_date(queryset) if ranked else queryset
+
+    match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in indexed)
+    if not ranked:
+        return queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s',
+                (match,),
+            )
+        )
+
+    # Unido a la tabla FTS: el MATCH corre una sola vez. Un ``bm25`` en una
+    # subconsulta por fila repetía el MATCH por cada resultado (segundos con
+    # miles de coincidencias, ver ``bench_order_search``).
+    # bm25 es negativo: más relevante = más pequeño
+    return queryset.extra(
+        tables=[SQLITE_FTS_TABLE],
+        where=[f'{SQLITE_FTS_TABLE}.rowid = orders_order.id', f'{SQLITE_FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'search_rank': f'-bm25({SQLITE_FTS_TABLE})'},
+        order_by=['-search_rank', '-created_at'],
+    )
+
+
+def _search_fallback(queryset: QuerySet, terms: List[str], ranked: bool) -> QuerySet:
+    queryset = queryset.filter(_contains_all(terms))
+    return _rank_by_date(queryset) if ranked else queryset
+
+
+def _rank_by_date(queryset: QuerySet) -> QuerySet:
+    return queryset.annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    ).order_by('-created_at')
+
+
+_sqlite_fts_checked = {}
+
+
+def _sqlite_fts_available() -> bool:
+    alias = connection.alias
+    if alias not in _sqlite_fts_checked:
+        with connection.cursor() as cursor:
+            _sqlite_fts_checked[alias] = SQLITE_FTS_TABLE in connection.introspection.table_names(cursor)
+    return _sqlite_fts_checked[alias]
+
+
+__all__ = [
+    'SEARCH_SOURCE_FIELDS',
+    'build_search_document',
+    'normalize_search_text',
+    'search_orders',
+]
@@ -12,6 +12,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import transaction
 
 from .models import Order, OrderItem, BusinessSettings
 from .services import (
@@ -19,6 +20,7 @@ from .services import (
     get_acceptance_information,
     get_transaction_information,
     get_wompi_base_url,
+    quote_cart,
     split_phone_number,
 )
 from products.models import Product, Category
@@ -191,21 +193,21 @@ def order_step2(request):
             return redirect('orders:step2')
         
         # Calcular total para validar pedido mínimo
-        settings = BusinessSettings.get_settings()
-        total_amount = 0
-        for product_id, quantity in selected_products.items():
-            try:
-                product = Product.objects.get(id=product_id)
-                total_amount += product.price * quantity
-            except Product.DoesNotExist:
-                continue
+        order_info = request.session.get('order_cart', {}).get('order_info', {})
+        quote = quote_cart(selected_products, delivery_type=order_info.get('delivery_type'))
+        
+        if quote.unavailable:
+            messages.warning(request, 'Algunos productos seleccionados ya no están disponibles y se quitaron del pedido.')
+            selected_products = quote.quantities
+            if not selected_products:
+                return redirect('orders:step2')
         
         # Validar pedido mínimo
-        if total_amount < settings.minimum_order_amount:
+        if not quote.meets_minimum:
             messages.error(request, 
-                f'El pedido mínimo es ${settings.minimum_order_amount:,.0f}. '
-                f'Tu pedido actual es de ${total_amount:,.0f}. '
-                f'Agrega productos por ${settings.minimum_order_amount - total_amount:,.0f} más.'
+                f'El pedido mínimo es ${quote.minimum_order_amount:,.0f}. '
+                f'Tu pedido actual es de ${quote.subtotal:,.0f}. '
+                f'Agrega productos por ${quote.minimum_shortfall:,.0f} más.'
             )
             return redirect('orders:step2')
         
@@ -225,14 +227,7 @@ def order_step2(request):
         return redirect('orders:step3')
     
     # GET request - mostrar formulario
-    # Obtener productos y categorías
-    categories = Category.objects.filter(
-        products__is_available=True
-    ).distinct().order_by('name')
-    
-    products = Product.objects.select_related('category').filter(
-        is_available=True
-    ).order_by('category__name', 'name')
+    # Los productos y categorías los carga el navegador desde products:catalog_json
     
     # Obtener configuración
     settings = BusinessSettings.get_settings()
@@ -249,8 +244,6 @@ def order_step2(request):
     ]
     
     context = {
-        'products': products,
-        'categories': categories,
         'selected_products': selected_products,
         'settings': settings,
         
@@ -353,72 +346,69 @@ def order_step3(request):
         request.session.modified = True
 
         final_order_notes = request.POST.get('order_notes', order_notes)
+
+        # Se cotiza antes de crear el pedido: si ya no queda ningún producto
+        # disponible no se crea un pedido vacío
+        quote = quote_cart(selected_products, settings=settings_obj)
+        if not quote.quantities:
+            messages.error(request, 'Los productos seleccionados ya no están disponibles. Elige otros para continuar.')
+            return redirect('orders:step2')
+
         try:
             desired_date = datetime.strptime(order_info.get('desired_date'), '%Y-%m-%d').date()
             desired_time = datetime.strptime(order_info.get('desired_time'), '%H:%M').time()
 
-            order = None
-            pending_order_id = request.session.get('wompi_pending_order_id')
-            if pending_order_id:
-                try:
-                    order = Order.objects.get(id=pending_order_id, user=request.user)
-                except Order.DoesNotExist:
-                    request.session.pop('wompi_pending_order_id', None)
-                    order = None
-
-            if order:
-                order.items.all().delete()
-                order.delivery_type = order_info.get('delivery_type', 'pickup')
-                order.customer_name = order_info.get('customer_name', '')
-                order.customer_phone = order_info.get('customer_phone', '')
-                order.customer_email = order_info.get('customer_email', '')
-                order.desired_date = desired_date
-                order.desired_time = desired_time
-                order.delivery_address = order_info.get('delivery_address', '')
-                order.delivery_neighborhood = order_info.get('delivery_neighborhood', '')
-                order.delivery_references = order_info.get('delivery_references', '')
-                order.payment_method = payment_method
-                order.notes = final_order_notes
-                order.status = 'pending'
-                order.payment_status = 'pending'
-                order.payment_reference = ''
-                order.save()
-            else:
-                order = Order.objects.create(
-                    user=request.user,
-                    delivery_type=order_info.get('delivery_type', 'pickup'),
-                    customer_name=order_info.get('customer_name', ''),
-                    customer_phone=order_info.get('customer_phone', ''),
-                    customer_email=order_info.get('customer_email', ''),
-                    desired_date=desired_date,
-                    desired_time=desired_time,
-                    delivery_address=order_info.get('delivery_address', ''),
-                    delivery_neighborhood=order_info.get('delivery_neighborhood', ''),
-                    delivery_references=order_info.get('delivery_references', ''),
-                    payment_method=payment_method,
-                    notes=final_order_notes,
-                    status='pending'
-                )
-
-            # Crear los items del pedido CON LAS CANTIDADES CORRECTAS
-            for product_id, quantity in selected_products.items():
-                try:
-                    product = Product.objects.get(id=product_id)
-                    quantity = int(quantity)  # Asegurar que sea entero
-
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=quantity,
-                        unit_price=product.price,
-                        total_price=product.price * quantity
+            # El pedido y sus items en una sola transacción: no queda un pedido
+            # sin items si algo falla y el historial se invalida una sola vez
+            with transaction.atomic():
+                order = None
+                pending_order_id = request.session.get('wompi_pending_order_id')
+                if pending_order_id:
+                    try:
+                        order = Order.objects.get(id=pending_order_id, user=request.user)
+                    except Order.DoesNotExist:
+                        request.session.pop('wompi_pending_order_id', None)
+                        order = None
+
+                if order:
+                    order.delivery_type = order_info.get('delivery_type', 'pickup')
+                    order.customer_name = order_info.get('customer_name', '')
+                    order.customer_phone = order_info.get('customer_phone', '')
+                    order.customer_email = order_info.get('customer_email', '')
+                    order.desired_date = desired_date
+                    order.desired_time = desired_time
+                    order.delivery_address = order_info.get('delivery_address', '')
+                    order.delivery_neighborhood = order_info.get('delivery_neighborhood', '')
+                    order.delivery_references = order_info.get('delivery_references', '')
+                    order.payment_method = payment_method
+                    order.notes = final_order_notes
+                    order.status = 'pending'
+                    order.payment_status = 'pending'
+                    order.payment_reference = ''
+                    order.save()
+                else:
+                    order = Order.objects.create(
+                        user=request.user,
+                        delivery_type=order_info.get('delivery_type', 'pickup'),
+                        customer_name=order_info.get('customer_name', ''),
+                        customer_phone=order_info.get('customer_phone', ''),
+                        customer_email=order_info.get('customer_email', ''),
+                        desired_date=desired_date,
+                        desired_time=desired_time,
+                        delivery_address=order_info.get('delivery_address', ''),
+                        delivery_neighborhood=order_info.get('delivery_neighborhood', ''),
+                        delivery_references=order_info.get('delivery_references', ''),
+                        payment_method=payment_method,
+                        notes=final_order_notes,
+                        status='pending'
                     )
 
-                except Product.DoesNotExist:
-                    continue
+                # Crear los items del pedido CON LAS CANTIDADES CORRECTAS
+                # (reemplaza los items previos y calcula los totales una sola vez)
+                order.set_items(quote.quantities, products=quote.products)
 
-            # Asegurar que los totales se calculen correctamente
-            order.refresh_from_db()
+            if quote.unavailable:
+                messages.warning(request, 'Algunos productos ya no están disponibles y no se incluyeron en el pedido.')
             messages.success(request, f"¡Pedido #{order.id} creado exitosamente!")
 
             if payment_method == 'wompi':
@@ -438,16 +428,14 @@ def order_step3(request):
             messages.error(request, f"Error al crear el pedido: {str(e)}")
     
     # Preparar datos para el template (GET request)
-    products_data = {}
-    for product_id in selected_products.keys():
-        try:
-            product = Product.objects.get(id=product_id)
-            products_data[str(product_id)] = {
-                'name': product.name,
-                'price': float(product.price)
-            }
-        except Product.DoesNotExist:
-            continue
+    quote = quote_cart(selected_products, settings=settings_obj)
+    products_data = {
+        str(line.product.id): {
+            'name': line.product.name,
+            'price': float(line.unit_price)
+        }
+        for line in quote.lines
+    }
     
     # Configuración de steps para el template base
     all_steps = [
@@ -1,10 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django import forms
 from django.contrib import admin, messages
+from django.db import transaction
 from django.urls import reverse
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from unfold.admin import ModelAdmin as UnfoldModelAdmin
+from .catalog import bump_catalog_version
+from .images import THUMBNAIL_SIZE, ImageRejected, open_image
 from .models import Product, Category
-from .supabase_storage import SupabaseStorage
+from .storage import get_image_storage
+from .tasks import enqueue_image_deletes, enqueue_image_upload, schedule_image_delete
 
 
 class ProductForm(forms.ModelForm):
@@ -22,74 +27,163 @@ class ProductForm(forms.ModelForm):
         else:
             self.fields['clear_image'].widget = forms.HiddenInput()
 
+    def clean_image_file(self):
+        uploaded_file = self.cleaned_data.get('image_file')
+        if uploaded_file:
+            # Solo lee la cabecera: la imagen se decodifica en el worker
+            try:
+                open_image(uploaded_file)
+            except ImageRejected as e:
+                raise forms.ValidationError(str(e))
+            except Exception:
+                # No es una imagen: se sube como archivo
+                pass
+            finally:
+                uploaded_file.seek(0)
+        return uploaded_file
+
     def save(self, commit=True):
         instance = super().save(commit=False)
-        storage = SupabaseStorage()
-        
+        # La conversión, subida y borrado de imágenes las hace el worker
+        # (products.tasks); se encolan cuando el producto ya tiene id
+        self._pending_upload = None
+        self._discarded_image = None
+
         # Eliminar imagen si se marcó clear_image
         if self.cleaned_data.get('clear_image'):
-            if instance.image:
-                storage.delete(instance.image)
+            self._discarded_image = instance.image
             instance.image = None
-        
+            instance.image_sizes = []
+            instance.image_formats = []
+            instance.image_status = 'ready'
+
         # Subir nueva imagen si se proporcionó
         elif self.cleaned_data.get('image_file'):
             uploaded_file = self.cleaned_data['image_file']
-            
-            # Eliminar imagen anterior si existe
-            if instance.image:
-                storage.delete(instance.image)
-            
-            # Subir nueva imagen a Supabase
-            new_key = storage._save(uploaded_file.name, uploaded_file)
-            instance.image = new_key
-        
+            uploaded_file.seek(0)
+            self._pending_upload = (
+                uploaded_file.name,
+                uploaded_file.read(),
+                getattr(uploaded_file, 'content_type', '') or '',
+            )
+            # La imagen anterior se sigue mostrando hasta que la nueva esté lista
+            instance.image_status = 'processing'
+
         if commit:
             instance.save()
-        
+            self._save_m2m()
+
         return instance
 
+    def _save_m2m(self):
+        super()._save_m2m()
+        self.enqueue_image_jobs()
 
-def duplicate_products(_modeladmin, request, queryset):
-    duplicated_count = 0
+    def enqueue_image_jobs(self):
+        if self._discarded_image:
+            schedule_image_delete(self._discarded_image)
+        if self._pending_upload:
+            filename, raw, content_type = self._pending_upload
+            enqueue_image_upload(self.instance, filename, raw, content_type)
+        self._pending_upload = self._discarded_image = None
+
+
+# Copias de imágenes simultáneas al duplicar productos
+DUPLICATE_IMAGE_WORKERS = 8
+# Errores que se listan en el aviso; del resto solo se informa la cantidad
+MAX_LISTED_ERRORS = 10
+
+
+def copy_product_images(pairs, storage, workers=DUPLICATE_IMAGE_WORKERS):
+    """
+    Copia al duplicado la imagen de cada ``(original, duplicado)`` y devuelve
+    los errores. Con imágenes por contenido solo suma referencias; si no,
+    copia en paralelo con hasta ``workers`` hilos.
+    """
     errors = []
-    storage = SupabaseStorage()
-    
-    for original_product in queryset:
+
+    def copy_image(original_product, duplicated_product, copy):
         try:
-            duplicated_product = Product(
-                name=f"{original_product.name} (Copia)",
-                description=original_product.description,
-                price=original_product.price,
-                weight=original_product.weight,
-                category=original_product.category,
-                is_available=original_product.is_available,
-                ingredients=original_product.ingredients,
-            )
-            
-            # Duplicar imagen si existe
-            if original_product.image:
-                try:
-                    new_key = storage.copy(original_product.image)
-                    duplicated_product.image = new_key
-                except Exception as img_error:
-                    errors.append(f'Imagen no duplicada para "{original_product.name}": {str(img_error)}')
-            
-            duplicated_product.save()
-            duplicated_count += 1
-            
-        except Exception as e:
-            errors.append(f'Error duplicando "{original_product.name}": {str(e)}')
-    
+            duplicated_product.image = copy()
+            duplicated_product.image_sizes = original_product.image_sizes
+            duplicated_product.image_formats = original_product.image_formats
+        except Exception as img_error:
+            errors.append(f'Imagen no duplicada para "{original_product.name}": {str(img_error)}')
+
+    if storage.deduplicate:
+        # Imágenes por contenido: duplicar solo suma referencias, sin I/O
+        for original_product, duplicated_product in pairs:
+            copy_image(original_product, duplicated_product,
+                       lambda: storage.copy(original_product.image, original_product.image_sizes,
+                                            original_product.image_formats))
+    elif pairs:
+        # Duplicar imágenes en paralelo: cada copia es casi todo espera de red
+        with ThreadPoolExecutor(max_workers=min(workers, len(pairs))) as pool:
+            futures = {
+                pool.submit(storage.copy, original_product.image, original_product.image_sizes,
+                            original_product.image_formats):
+                    (original_product, duplicated_product)
+                for original_product, duplicated_product in pairs
+            }
+            for future in as_completed(futures):
+                copy_image(*futures[future], future.result)
+    return errors
+
+
+def duplicate_products(_modeladmin, request, queryset):
+    storage = get_image_storage()
+    originals = list(queryset)
+
+    duplicates = [
+        Product(
+            name=f"{original_product.name} (Copia)",
+            description=original_product.description,
+            price=original_product.price,
+            weight=original_product.weight,
+            category_id=original_product.category_id,
+            is_available=original_product.is_available,
+            ingredients=original_product.ingredients,
+        )
+        for original_product in originals
+    ]
+
+    with_image = [
+        (original_product, duplicated_product)
+        for original_product, duplicated_product in zip(originals, duplicates)
+        if original_product.image
+    ]
+    errors = copy_product_images(with_image, storage)
+
+    try:
+        Product.objects.bulk_create(duplicates)
+        duplicated_count = len(duplicates)
+    except Exception as e:
+        duplicated_count = 0
+        errors.append(f'Error duplicando los productos: {str(e)}')
+        # Las imágenes ya copiadas quedarían huérfanas
+        enqueue_image_deletes([product.image for product in duplicates if product.image])
+    else:
+        # ``bulk_create`` no dispara las señales que invalidan el catálogo
+        transaction.on_commit(bump_catalog_version)
+
     if duplicated_count > 0:
         if duplicated_count == 1:
             messages.success(request, 'Se duplicó 1 producto exitosamente.')
         else:
             messages.success(request, f'Se duplicaron {duplicated_count} productos exitosamente.')
-    
+
     if errors:
-        for error in errors:
-            messages.warning(request, error)
+        listed = errors[:MAX_LISTED_ERRORS]
+        if len(errors) > len(listed):
+            listed.append(f'… y {len(errors) - len(listed)} errores más.')
+        messages.warning(
+            request,
+            format_html(
+                'Problemas al duplicar ({}):<ul>{}</ul>',
+                len(errors),
+                format_html_join('', '<li>{}</li>', ((error,) for error in listed)),
+            ),
+        )
 
 duplicate_products.short_description = "Duplicar productos seleccionados"
 
@@ -114,7 +208,7 @@ class CategoryAdmin(UnfoldModelAdmin):
 class ProductAdmin(UnfoldModelAdmin):
     form = ProductForm
     list_display = ['image_preview', 'name_link', 'price', 'weight', 'category', 'is_available']
-    list_filter = ['category', 'is_available', 'created_at']
+    list_filter = ['category', 'is_available', 'image_status', 'created_at']
     search_fields = ['name', 'description']
     list_editable = ['price', 'weight', 'is_available']
     readonly_fields = ['image_preview_large', 'created_at', 'updated_at']
@@ -147,16 +241,28 @@ class ProductAdmin(UnfoldModelAdmin):
     name_link.short_description = 'Nombre'
     name_link.admin_order_field = 'name'
     
+    def image_status_badge(self, obj):
+        if obj.image_status == 'ready':
+            return ''
+        color = '#f59e0b' if obj.image_status == 'processing' else '#ef4444'
+        return format_html(
+            '<div style="margin-top: 4px; font-size: 10px; color: {};">{}</div>',
+            color,
+            obj.get_image_status_display()
+        )
+
     def image_preview(self, obj):
-        url = obj.image_secure_url()
+        url = obj.image_url(THUMBNAIL_SIZE)
         if url:
             return format_html(
-                '<img src="{}" alt="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 4px;">',
+                '<img src="{}" alt="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 4px;">{}',
                 url,
-                obj.name
+                obj.name,
+                self.image_status_badge(obj)
             )
         return format_html(
-            '<div style="width: 50px; height: 50px; background-color: #f3f4f6; border-radius: 4px; display: flex; align-items: center; justify-content: center; color: #9ca3af; font-size: 10px;">Sin img</div>'
+            '<div style="width: 50px; height: 50px; background-color: #f3f4f6; border-radius: 4px; display: flex; align-items: center; justify-content: center; color: #9ca3af; font-size: 10px;">Sin img</div>{}',
+            self.image_status_badge(obj)
         )
     image_preview.short_description = 'Img'
     
@@ -166,19 +272,24 @@ class ProductAdmin(UnfoldModelAdmin):
             return format_html(
                 '''
                 <div style="margin-top: 10px;">
-                    <img src="{}" alt="{}" style="max-width: 300px; max-height: 300px; object-fit: cover; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+                    <img src="{}" srcset="{} 2x" alt="{}" style="max-width: 300px; max-height: 300px; object-fit: cover; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
                     <p style="margin-top: 8px; font-size: 12px; color: #e5e7eb;">
                         <strong style="color:#f9fafb;">Archivo:</strong> <span style="color:#d1d5db;">{}</span><br>
                         <a href="{}" target="_blank" style="color:#93c5fd; text-decoration: underline;">Ver imagen completa</a>
                     </p>
+                    {}
                 </div>
                 ''',
-                url,
+                # Al tamaño exacto del recuadro (y el doble para pantallas HiDPI)
+                obj.image_resized_url(300),
+                obj.image_resized_url(600),
                 obj.name,
                 obj.image or "",
-                url
+                url,
+                self.image_status_badge(obj)
             )
         return format_html(
-            '<div style="padding: 20px; background-color: #111827; border-radius: 8px; text-align: center; color: #e5e7eb;">No hay imagen cargada</div>'
+            '<div style="padding: 20px; background-color: #111827; border-radius: 8px; text-align: center; color: #e5e7eb;">No hay imagen cargada</div>{}',
+            self.image_status_badge(obj)
         )
     image_preview_large.short_description = 'Vista previa'
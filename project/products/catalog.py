@@ -0,0 +1,230 @@
+"""
+Snapshot inmutable del catálogo de productos.
+
+El catálogo (productos disponibles, categorías, precios y URLs de imagen) se
+serializa una vez por versión y se guarda en el cache compartido. Cada worker
+conserva además su propia copia deserializada, de modo que el listado, el
+detalle y el selector de productos del checkout se pintan sin consultar la
+base de datos. La versión es la generación del namespace ``catalog_cache``:
+las señales de productos/categorías la incrementan e invalidan con ella el
+snapshot y las páginas/fragmentos cacheados del catálogo.
+"""
+
+import gzip
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.dispatch import receiver
+
+from core.cache import catalog_cache
+
+from .images import CARD_SIZE, fallback_format, image_srcset, image_url, public_url, resized_url
+
+CATALOG_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+# Cambia cuando cambia la forma de ``CatalogSnapshot.to_dict``
+CATALOG_SNAPSHOT_FORMAT = 3
+# Fuera de un request (shell, comandos) la versión se revalida cada pocos segundos
+CATALOG_LOCAL_TTL = 5
+
+
+@dataclass(frozen=True)
+class CatalogCategory:
+    id: int
+    name: str
+    slug: str
+
+
+@dataclass(frozen=True)
+class CatalogProduct:
+    id: int
+    name: str
+    description: str
+    price: Decimal
+    weight: Optional[int]
+    ingredients: str
+    image: str
+    image_sizes: Tuple[int, ...]
+    image_formats: Tuple[str, ...]
+    category: CatalogCategory
+    is_available: bool = True
+
+    @property
+    def formatted_price(self):
+        return f"${self.price:,.0f}"
+
+    def image_secure_url(self):
+        return public_url(self.image)
+
+    def image_url(self, size=None, fmt='webp'):
+        return image_url(self.image, self.image_sizes, size, fmt)
+
+    def image_srcset(self, fmt='webp'):
+        return image_srcset(self.image, self.image_sizes, fmt)
+
+    @property
+    def image_fallback_format(self):
+        return fallback_format(self.image_formats)
+
+    def image_resized_url(self, width, quality=None):
+        return resized_url(self.image, width, quality)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    products: Tuple[CatalogProduct, ...]
+    categories: Tuple[CatalogCategory, ...]
+    _by_id: Dict[int, CatalogProduct] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, '_by_id', {product.id: product for product in self.products})
+
+    def get_product(self, product_id):
+        try:
+            return self._by_id.get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+
+    def to_dict(self):
+        """Forma serializable (solo tipos básicos) que se guarda en el cache"""
+        return {
+            'version': self.version,
+            'categories': [[c.id, c.name, c.slug] for c in self.categories],
+            'products': [
+                [p.id, p.name, p.description, str(p.price), p.weight,
+                 p.ingredients, p.image, list(p.image_sizes), list(p.image_formats), p.category.id]
+                for p in self.products
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        categories = {row[0]: CatalogCategory(*row) for row in data['categories']}
+        products = tuple(
+            CatalogProduct(
+                id=row[0], name=row[1], description=row[2], price=Decimal(row[3]),
+                weight=row[4], ingredients=row[5], image=row[6], image_sizes=tuple(row[7]),
+                image_formats=tuple(row[8]), category=categories[row[9]],
+            )
+            for row in data['products']
+        )
+        return cls(version=data['version'], products=products, categories=tuple(categories.values()))
+
+
+def build_snapshot(version):
+    """Arma el snapshot a partir de la base de datos (2 consultas)"""
+    from .models import Category, Product
+
+    products = list(
+        Product.objects.select_related('category')
+        .filter(is_available=True)
+        .order_by('category__name', 'name')
+    )
+    category_ids = {product.category_id for product in products}
+    categories = {
+        category.id: CatalogCategory(category.id, category.name, category.slug)
+        for category in Category.objects.filter(id__in=category_ids).order_by('name')
+    }
+    return CatalogSnapshot(
+        version=version,
+        categories=tuple(categories.values()),
+        products=tuple(
+            CatalogProduct(
+                id=product.id,
+                name=product.name,
+                description=product.description or '',
+                price=product.price,
+                weight=product.weight,
+                ingredients=product.ingredients or '',
+                image=product.image or '',
+                image_sizes=tuple(product.image_sizes or ()),
+                image_formats=tuple(product.image_formats or ()),
+                category=categories[product.category_id],
+            )
+            for product in products
+        ),
+    )
+
+
+_local = {'version': None, 'snapshot': None, 'valid_until': 0.0, 'payload': None}
+
+
+def get_catalog_version():
+    return catalog_cache.generation()
+
+
+def get_catalog():
+    """Devuelve el snapshot vigente del catálogo"""
+    now = time.monotonic()
+    if _local['snapshot'] is not None and now < _local['valid_until']:
+        return _local['snapshot']
+
+    version = get_catalog_version()
+    if _local['snapshot'] is None or _local['version'] != version:
+        snapshot_key = catalog_cache.key('snapshot', CATALOG_SNAPSHOT_FORMAT, generation=version)
+        data = cache.get(snapshot_key)
+        if data is None:
+            snapshot = build_snapshot(version)
+            cache.set(snapshot_key, snapshot.to_dict(), CATALOG_SNAPSHOT_TIMEOUT)
+        else:
+            snapshot = CatalogSnapshot.from_dict(data)
+        _local['snapshot'] = snapshot
+        _local['version'] = version
+
+    _local['valid_until'] = now + CATALOG_LOCAL_TTL
+    return _local['snapshot']
+
+
+def bump_catalog_version():
+    """Invalida el snapshot (y todo el namespace del catálogo) en todos los workers"""
+    catalog_cache.bump()
+    _local['snapshot'] = None
+    _local['payload'] = None
+    _local['valid_until'] = 0.0
+
+
+def get_catalog_payload(snapshot):
+    """
+    JSON compacto del catálogo para el selector de productos del checkout.
+
+    Devuelve ``(json, json_gzip)`` en bytes. Se serializa y comprime una sola
+    vez por versión del catálogo en cada worker.
+    """
+    cached = _local['payload']
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1], cached[2]
+
+    data = {
+        'version': snapshot.version,
+        'categories': [
+            {'id': category.id, 'name': category.name, 'slug': category.slug}
+            for category in snapshot.categories
+        ],
+        'products': [
+            {
+                'id': product.id,
+                'name': product.name,
+                'price': int(product.price),
+                'weight': product.weight,
+                'category': product.category.slug,
+                # El selector del checkout muestra tarjetas pequeñas
+                'imageUrl': product.image_url(CARD_SIZE),
+            }
+            for product in snapshot.products
+        ],
+    }
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    _local['payload'] = (snapshot.version, body, compressed)
+    return body, compressed
+
+
+@receiver(request_started)
+def revalidate_catalog_per_request(sender, **kwargs):
+    """Cada request vuelve a comprobar la versión del catálogo una vez"""
+    _local['valid_until'] = 0.0
@@ -0,0 +1,309 @@
+"""
+Tamaños derivados de las imágenes de productos.
+
+Al subir una imagen se guarda el original en WebP y además una versión por
+cada ancho de ``IMAGE_SIZES``, con una llave predecible a partir de la del
+original::
+
+    products/<uuid>-pan.webp        -> original
+    products/<uuid>-pan.w320.webp   -> 320 px de ancho
+
+``Product.image_sizes`` guarda qué anchos existen (una imagen más angosta que
+un tamaño no se amplía), así que las imágenes subidas antes de esto siguen
+funcionando con el original.
+
+Cada tamaño derivado se guarda además en los formatos de
+``PRODUCT_IMAGE_FORMATS`` (``.w320.avif``, ``.w320.jpg``) y
+``Product.image_formats`` registra cuáles existen. Las plantillas los
+ofrecen con ``<picture>`` (``{% picture_sources %}``): el navegador elige
+AVIF o WebP y los que no soportan ninguno usan el JPEG del ``<img>``.
+
+``process_image`` es el único paso que decodifica la imagen subida: la abre
+una vez (a escala reducida si es un JPEG grande), rechaza las que superan
+``PRODUCT_IMAGE_MAX_MEGAPIXELS`` antes de decodificarlas y entrega las
+versiones codificadas una por una. ``manage.py bench_images`` mide su CPU y
+memoria máxima. ``manage.py reencode_images`` pasa por el mismo pipeline las
+imágenes guardadas antes (sin derivados ni formatos).
+
+Para anchos fuera de ``IMAGE_SIZES``, ``resized_url`` apunta a ``/img/``,
+que redimensiona al vuelo desde el tamaño guardado más cercano y cachea el
+resultado en disco.
+"""
+
+import os
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.module_loading import import_string
+from PIL import ExifTags, Image, ImageOps
+
+# Anchos generados: miniaturas (admin, historial), tarjetas y detalle
+IMAGE_SIZES = (64, 320, 800)
+THUMBNAIL_SIZE = 64
+CARD_SIZE = 320
+DETAIL_SIZE = 800
+
+ORIGINAL_QUALITY = 85
+DERIVATIVE_QUALITY = 80
+
+# Formatos de los tamaños derivados, del preferido al de respaldo. WebP
+# siempre se guarda (es el de ``image_url``/``image_srcset``); el original
+# solo en WebP
+IMAGE_FORMATS = ("avif", "webp", "jpeg")
+FORMAT_CONTENT_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+FORMAT_EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+# AVIF se ve igual con bastante menos calidad nominal: q80 en WebP ~ q50
+AVIF_QUALITY_OFFSET = 30
+
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """Parámetros del codificador: más esfuerzo = menos bytes y más CPU"""
+    name: str
+    webp_method: int
+    avif_speed: int
+    jpeg_optimize: bool
+
+
+# ``PRODUCT_IMAGE_ENCODER_PROFILES`` elige uno por contexto: ``upload``
+# (worker), ``resize`` (/img/, en el request) y ``regenerate``. Con una foto
+# de 1600 px, de fast a max-compression el WebP baja ~10% y tarda ~2.5x más;
+# el AVIF baja ~25% y tarda ~50x más
+ENCODER_PROFILES = {
+    profile.name: profile
+    for profile in (
+        EncoderProfile("fast", webp_method=2, avif_speed=8, jpeg_optimize=False),
+        EncoderProfile("balanced", webp_method=4, avif_speed=6, jpeg_optimize=True),
+        EncoderProfile("max-compression", webp_method=6, avif_speed=4, jpeg_optimize=True),
+    )
+}
+
+# Lado mayor del original guardado (el doble del tamaño de detalle): una foto
+# de celular de 12 MP se guarda a 1600x1200
+MAX_DIMENSION = 1600
+
+
+# Redimensionador /img/<llave>?w=&q= (products.views.image_proxy): el ancho
+# se redondea hacia arriba a múltiplos de RESIZE_WIDTH_STEP y la calidad a
+# múltiplos de 5, para acotar cuántas variantes se pueden pedir por imagen
+RESIZE_WIDTH_STEP = 16
+RESIZE_QUALITY_STEP = 5
+RESIZE_MIN_QUALITY = 30
+RESIZE_MAX_QUALITY = 95
+
+
+class ImageRejected(ValueError):
+    """La imagen no se acepta (p. ej. supera el máximo de megapíxeles)"""
+
+
+def public_url(key):
+    if not key:
+        return ''
+    return import_string(settings.PRODUCT_IMAGE_STORAGE).public_url(key)
+
+
+def derivative_key(key, width, fmt="webp"):
+    """``products/x.webp`` -> ``products/x.w320.webp`` (``.w320.avif``, ...)"""
+    root, _ = os.path.splitext(key)
+    return f"{root}.w{width}.{FORMAT_EXTENSIONS[fmt]}"
+
+
+def image_content_type(key):
+    """Content-Type de un objeto de imagen según su extensión"""
+    ext = os.path.splitext(key)[1].lstrip(".")
+    for fmt, fmt_ext in FORMAT_EXTENSIONS.items():
+        if ext == fmt_ext:
+            return FORMAT_CONTENT_TYPES[fmt]
+    return "image/webp"
+
+
+def stored_formats(formats):
+    """
+    Formatos guardados de los derivados en orden de preferencia (las
+    imágenes anteriores a los formatos alternativos solo tienen WebP)
+    """
+    formats = set(formats or ()) | {"webp"}
+    return [fmt for fmt in IMAGE_FORMATS if fmt in formats]
+
+
+def fallback_format(formats):
+    """Formato del ``<img>`` dentro de ``<picture>``: JPEG si existe"""
+    return "jpeg" if "jpeg" in (formats or ()) else "webp"
+
+
+def negotiate_format(accept, formats=IMAGE_FORMATS):
+    """El formato preferido de ``formats`` que acepta el header ``Accept``"""
+    for fmt in stored_formats(formats):
+        if FORMAT_CONTENT_TYPES[fmt] in accept:
+            return fmt
+    return fallback_format(formats)
+
+
+def pick_size(sizes, width):
+    """El menor ancho disponible que cubre ``width`` (None = usar el original)"""
+    for size in sorted(sizes or ()):
+        if size >= width:
+            return size
+    return None
+
+
+def image_url(key, sizes, width=None, fmt="webp"):
+    if not key:
+        return ''
+    size = pick_size(sizes, width) if width else None
+    return public_url(derivative_key(key, size, fmt) if size else key)
+
+
+def image_srcset(key, sizes, fmt="webp"):
+    """Valor del atributo ``srcset`` con los anchos disponibles"""
+    if not key:
+        return ''
+    return ', '.join(
+        f"{public_url(derivative_key(key, size, fmt))} {size}w" for size in sorted(sizes or ())
+    )
+
+
+def resize_params(width, quality=None):
+    """
+    ``(ancho, calidad)`` normalizados del redimensionador. Lanza ValueError
+    si no son números válidos.
+    """
+    width = int(width)
+    quality = DERIVATIVE_QUALITY if quality in (None, '') else int(quality)
+    if width < 1 or not 1 <= quality <= 100:
+        raise ValueError(f"Parámetros inválidos: w={width} q={quality}")
+    width = min(-(-width // RESIZE_WIDTH_STEP) * RESIZE_WIDTH_STEP, MAX_DIMENSION)
+    quality = round(quality / RESIZE_QUALITY_STEP) * RESIZE_QUALITY_STEP
+    return width, min(max(quality, RESIZE_MIN_QUALITY), RESIZE_MAX_QUALITY)
+
+
+def resized_url(key, width, quality=None):
+    """URL de ``key`` redimensionada al vuelo a ``width`` px"""
+    if not key:
+        return ''
+    width, quality = resize_params(width, quality)
+    query = {'w': width}
+    if quality != DERIVATIVE_QUALITY:
+        query['q'] = quality
+    return f"{reverse('image_proxy', args=[key])}?{urlencode(query)}"
+
+
+def open_image(fp):
+    """
+    Abre ``fp`` leyendo solo la cabecera (sin decodificar) y rechaza las
+    imágenes de más de ``PRODUCT_IMAGE_MAX_MEGAPIXELS``. Si ``fp`` no es una
+    imagen lanza la excepción de Pillow.
+    """
+    limit = settings.PRODUCT_IMAGE_MAX_MEGAPIXELS
+    try:
+        img = Image.open(fp)
+    except Image.DecompressionBombError as exc:
+        raise ImageRejected(f"La imagen es demasiado grande (máximo {limit} MP)") from exc
+    width, height = img.size
+    megapixels = width * height / 1_000_000
+    if megapixels > limit:
+        raise ImageRejected(
+            f"La imagen tiene {megapixels:.0f} MP ({width}x{height}); el máximo es {limit} MP"
+        )
+    return img
+
+
+def encoder_profile(profile=None, context="upload"):
+    """
+    ``profile`` (nombre o ``EncoderProfile``) o, sin él, el configurado para
+    ``context`` en ``PRODUCT_IMAGE_ENCODER_PROFILES``
+    """
+    if isinstance(profile, EncoderProfile):
+        return profile
+    name = profile or settings.PRODUCT_IMAGE_ENCODER_PROFILES[context]
+    try:
+        return ENCODER_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Perfil de codificación desconocido: {name}") from None
+
+
+def encode_image(img, quality, fmt="webp", profile=None):
+    """Codifica ``img`` (RGB) en ``fmt`` con el perfil dado (por defecto el de ``upload``)"""
+    profile = encoder_profile(profile)
+    out = BytesIO()
+    if fmt == "avif":
+        img.save(out, format="AVIF", quality=max(quality - AVIF_QUALITY_OFFSET, 1), speed=profile.avif_speed)
+    elif fmt == "jpeg":
+        img.save(out, format="JPEG", quality=quality, optimize=profile.jpeg_optimize, progressive=profile.jpeg_optimize)
+    else:
+        img.save(out, format="WEBP", quality=quality, method=profile.webp_method)
+    return out.getvalue()
+
+
+def decode_image(fp, max_width, max_height=None):
+    """
+    Decodifica ``fp`` enderezada y en RGB. Si es un JPEG más grande que
+    ``max_width`` x ``max_height`` (sin ``max_height``, solo el ancho), a la
+    menor escala (1/2, 1/4, 1/8) que todavía cubre ese tamaño.
+    """
+    img = open_image(fp)
+    width, height = img.size
+    if img.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+        # Girada 90°: los límites aplican a la imagen ya enderezada
+        width, height = height, width
+    # ``draft`` solo reduce la escala si ambos lados siguen cubriendo el
+    # tamaño pedido, así que se le pide el final conservando la proporción
+    scale = min(1, max_width / width, (max_height or height) / height)
+    img.draft("RGB", (round(img.width * scale), round(img.height * scale)))
+    ImageOps.exif_transpose(img, in_place=True)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+
+def process_image(fp, sizes=IMAGE_SIZES, formats=None, max_dimension=MAX_DIMENSION, profile=None):
+    """
+    Decodifica ``fp`` una sola vez y va entregando ``(ancho, formato, datos)``:
+    primero el original en WebP (ancho None) y después cada tamaño derivado,
+    de mayor a menor, en cada formato de ``formats`` (por defecto
+    ``PRODUCT_IMAGE_FORMATS``). Sin ``profile`` se codifica con el perfil
+    del contexto ``upload``.
+    Como es un generador, quien lo consume sube cada resultado antes de que
+    se codifique el siguiente y en memoria hay una sola versión a la vez.
+
+    - Los JPEG se decodifican directamente a la menor escala (1/2, 1/4, 1/8)
+      que todavía cubre ``max_dimension``.
+    - El original se endereza según su orientación EXIF y se limita a
+      ``max_dimension`` px por lado.
+    - Cada derivado se reduce desde el anterior y el anterior se libera.
+    """
+    formats = stored_formats(settings.PRODUCT_IMAGE_FORMATS if formats is None else formats)
+    profile = encoder_profile(profile, "upload")
+    # Reasignar ``img`` suelta la versión anterior (no se usa ``close()``,
+    # que también cerraría ``fp``)
+    img = decode_image(fp, max_dimension, max_dimension)
+    img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    yield None, "webp", encode_image(img, ORIGINAL_QUALITY, "webp", profile)
+
+    for size in sorted(sizes, reverse=True):
+        width, height = img.size
+        if size >= width:
+            continue
+        img = img.resize((size, max(1, round(height * size / width))), Image.LANCZOS)
+        for fmt in formats:
+            yield size, fmt, encode_image(img, DERIVATIVE_QUALITY, fmt, profile)
+
+
+def process_image_bytes(raw, profile=None):
+    """Todas las salidas de ``process_image`` para ``raw``, en una lista (para otro proceso)"""
+    return list(process_image(BytesIO(raw), profile=profile))
+
+
+def render_width(fp, width, quality=DERIVATIVE_QUALITY, fmt="webp", profile=None):
+    """
+    Una versión de ``fp`` de ``width`` px de ancho (sin ampliarla). Sin
+    ``profile`` se codifica con el perfil del contexto ``resize``.
+    """
+    img = decode_image(fp, width)
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    return encode_image(img, quality, fmt, encoder_profile(profile, "resize"))
@@ -0,0 +1,79 @@
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from PIL import Image
+
+from products.admin import DUPLICATE_IMAGE_WORKERS, copy_product_images
+from products.models import Product
+from products.storage import LocalImageStorage
+
+
+def _sample_image(index):
+    """PNG distinto por producto, para que cada uno tenga su propia imagen"""
+    img = Image.new('RGB', (800, 600), ((index * 37) % 256, (index * 91) % 256, (index * 53) % 256))
+    out = BytesIO()
+    img.save(out, format='PNG')
+    return out
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la copia de imágenes de la acción "Duplicar productos" del admin con '
+        'N productos con imagen: una copia a la vez (como antes), en paralelo con '
+        'DUPLICATE_IMAGE_WORKERS hilos y en modo por contenido (solo referencias). '
+        'Usa un LocalImageStorage temporal con latencia simulada; no toca el '
+        'storage configurado ni guarda productos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=40,
+                            help='Productos con imagen a duplicar (por defecto 40)')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Segundos simulados por operación del storage (por defecto 0.05)')
+        parser.add_argument('--workers', type=int, default=DUPLICATE_IMAGE_WORKERS,
+                            help=f'Hilos de la copia en paralelo (por defecto {DUPLICATE_IMAGE_WORKERS})')
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['workers'] < 1:
+            raise CommandError('--products y --workers deben ser mayores que 0')
+
+        with tempfile.TemporaryDirectory() as location:
+            storage = LocalImageStorage(location=location, latency=0)
+            started = time.perf_counter()
+            originals = []
+            with override_settings(PRODUCT_IMAGE_DEDUPLICATE=False):
+                for index in range(options['products']):
+                    key, sizes, formats = storage.save_image(f'producto-{index}.png', _sample_image(index))
+                    originals.append(Product(
+                        name=f'Producto {index}', image=key, image_sizes=sizes, image_formats=formats,
+                    ))
+            objects = 1 + len(originals[0].image_sizes) * len(originals[0].image_formats)
+            self.stdout.write(
+                f"{len(originals)} productos con imagen ({objects} objetos cada una) "
+                f"preparados en {time.perf_counter() - started:.1f} s; latencia {options['latency'] * 1000:.0f} ms"
+            )
+            storage.latency = options['latency']
+
+            runs = [
+                ('una a la vez', False, 1),
+                (f"{options['workers']} hilos", False, options['workers']),
+                ('por contenido', True, options['workers']),
+            ]
+            baseline = None
+            for label, deduplicate, workers in runs:
+                pairs = [(original, Product(name=f'{original.name} (Copia)')) for original in originals]
+                # Las referencias del modo por contenido no se guardan
+                with override_settings(PRODUCT_IMAGE_DEDUPLICATE=deduplicate), transaction.atomic():
+                    started = time.perf_counter()
+                    errors = copy_product_images(pairs, storage, workers)
+                    elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f"{label:<14} {elapsed:>7.2f} s  {elapsed / len(pairs) * 1000:>7.1f} ms/producto  "
+                    f"x{baseline / elapsed:>6.1f}" + (f"  {len(errors)} errores" if errors else '')
+                )
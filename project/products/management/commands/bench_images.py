@@ -0,0 +1,244 @@
+import multiprocessing
+import os
+import sys
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from products.images import (
+    CARD_SIZE, DERIVATIVE_QUALITY, ENCODER_PROFILES, IMAGE_FORMATS, IMAGE_SIZES, MAX_DIMENSION,
+    ORIGINAL_QUALITY, decode_image, derivative_key, encode_image, encoder_profile, pick_size,
+    process_image, render_width,
+)
+
+# Foto de celular típica de 12 MP
+SAMPLE_SIZE = (4032, 3024)
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+
+def sample_photo():
+    """JPEG sintético de 12 MP con textura de foto y orientación EXIF"""
+    width, height = SAMPLE_SIZE
+    detail = Image.effect_mandelbrot((width // 4, height // 4), (-2.2, -1.2, 1.0, 1.2), 120)
+    detail = detail.resize(SAMPLE_SIZE, Image.BICUBIC)
+    noise = Image.effect_noise(SAMPLE_SIZE, 24)
+    gradient = Image.linear_gradient('L').resize(SAMPLE_SIZE)
+    img = Image.merge('RGB', (
+        Image.blend(detail, noise, 0.3),
+        Image.blend(gradient, noise, 0.25),
+        Image.blend(detail.transpose(Image.FLIP_LEFT_RIGHT), gradient, 0.5),
+    ))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Tomada con el celular en vertical
+    out = BytesIO()
+    img.save(out, format='JPEG', quality=90, exif=exif)
+    return out.getvalue()
+
+
+def _max_rss_mb(resource):
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB y macOS en bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _measure(raw, conn):
+    """Procesa ``raw`` en un proceso hijo y envía CPU, tiempo, memoria y bytes"""
+    import resource
+
+    baseline = _max_rss_mb(resource)
+    cpu, wall = time.process_time(), time.perf_counter()
+    sizes, output = set(), 0
+    upload = BytesIO(raw)
+    del raw
+    for size, _, data in process_image(upload):
+        sizes.add(size)
+        output += len(data)
+    conn.send({
+        'cpu': time.process_time() - cpu,
+        'wall': time.perf_counter() - wall,
+        'baseline_mb': baseline,
+        'peak_mb': _max_rss_mb(resource),
+        'output': output,
+        'sizes': sorted(size for size in sizes if size),
+    })
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide CPU y memoria máxima (RSS) del procesamiento de imágenes de '
+        'productos; sin rutas usa una foto sintética de 12 MP. Con --profiles '
+        'compara los perfiles de codificación y con --catalog los bytes de '
+        'imágenes de la primera página del catálogo en cada formato'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Imágenes o carpetas con imágenes')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Veces que se procesa cada imagen (por defecto 1)')
+        parser.add_argument('--profiles', action='store_true',
+                            help='Tiempo de codificación/decodificación y bytes de cada perfil')
+        parser.add_argument('--catalog', action='store_true',
+                            help='Bytes por página del catálogo en AVIF, WebP y JPEG')
+        parser.add_argument('--width', type=int, default=CARD_SIZE,
+                            help=f'Ancho de las imágenes con --catalog (por defecto {CARD_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['catalog']:
+            self._bench_catalog(options['width'])
+            return
+        samples = self._samples(options['paths'])
+        if not samples:
+            raise CommandError('No se encontraron imágenes')
+        if options['profiles']:
+            self._bench_profiles(samples, options['repeat'])
+            return
+
+        try:
+            import resource  # noqa: F401
+            context = multiprocessing.get_context('fork')
+        except (ImportError, ValueError):
+            raise CommandError('bench_images necesita Linux o macOS (fork y resource)')
+
+        self.stdout.write(
+            f"{'imagen':<28} {'MP':>5} {'entrada':>9} {'CPU':>7} {'tiempo':>7} "
+            f"{'RSS máx':>8} {'+RSS':>7} {'salida':>8}  tamaños"
+        )
+        for name, raw in samples:
+            with Image.open(BytesIO(raw)) as img:
+                megapixels = img.width * img.height / 1_000_000
+            for _ in range(options['repeat']):
+                # Un proceso por medición: el RSS máximo no se arrastra entre imágenes
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_measure, args=(raw, sender))
+                process.start()
+                sender.close()
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    self.stdout.write(self.style.ERROR(
+                        f"{name:<28} falló (código de salida {process.exitcode})"
+                    ))
+                    break
+                process.join()
+                self.stdout.write(
+                    f"{name[:28]:<28} {megapixels:>5.1f} {len(raw) / 1024:>7.0f}KB "
+                    f"{result['cpu']:>6.2f}s {result['wall']:>6.2f}s "
+                    f"{result['peak_mb']:>6.0f}MB {result['peak_mb'] - result['baseline_mb']:>5.0f}MB "
+                    f"{result['output'] / 1024:>6.0f}KB  {result['sizes']}"
+                )
+
+    def _bench_profiles(self, samples, repeat):
+        """
+        Por cada perfil y formato: tiempo de codificar las versiones que
+        genera una subida (original y tamaños derivados), tiempo de
+        decodificarlas (lo que paga el navegador) y bytes, sumados sobre
+        todas las imágenes
+        """
+        totals = {
+            (profile, fmt): {'encode': 0.0, 'decode': 0.0, 'bytes': 0}
+            for profile in ENCODER_PROFILES for fmt in IMAGE_FORMATS
+        }
+        for name, raw in samples:
+            started = time.perf_counter()
+            img = decode_image(BytesIO(raw), MAX_DIMENSION, MAX_DIMENSION)
+            img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+            self.stdout.write(
+                f"{name}: {img.width}x{img.height}, decodificada en "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            versions = [(img, ORIGINAL_QUALITY)] + [
+                (img.resize((size, max(1, round(img.height * size / img.width))), Image.LANCZOS),
+                 DERIVATIVE_QUALITY)
+                for size in sorted(IMAGE_SIZES, reverse=True)
+                if size < img.width
+            ]
+            for (profile, fmt), total in totals.items():
+                for version, quality in versions:
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        data = encode_image(version, quality, fmt, profile)
+                        encoded = time.perf_counter()
+                        Image.open(BytesIO(data)).load()
+                        total['encode'] += (encoded - started) / repeat
+                        total['decode'] += (time.perf_counter() - encoded) / repeat
+                    total['bytes'] += len(data)
+
+        self.stdout.write(
+            f"\n{len(samples)} imágenes (original + {len(IMAGE_SIZES)} tamaños cada una)\n"
+            f"{'perfil':<16} {'formato':<8} {'codificar':>10} {'decodificar':>12} {'bytes':>10}"
+        )
+        for (profile, fmt), total in totals.items():
+            self.stdout.write(
+                f"{profile:<16} {fmt:<8} {total['encode'] * 1000:>7.0f} ms {total['decode'] * 1000:>9.0f} ms "
+                f"{total['bytes'] / 1024:>8.1f}KB"
+            )
+
+    def _bench_catalog(self, width):
+        """
+        Recodifica, desde lo guardado en el storage, la imagen de cada tarjeta
+        de la primera página del catálogo en cada formato y suma los bytes
+        """
+        from products.models import Product
+        from products.pagination import paginate_products
+        from products.storage import get_image_storage
+        from products.views import PRODUCTS_PER_PAGE
+
+        products, _ = paginate_products(Product.objects.filter(is_available=True), None, PRODUCTS_PER_PAGE)
+        storage = get_image_storage()
+        totals = dict.fromkeys(IMAGE_FORMATS, 0)
+        measured = failed = 0
+        for product in products:
+            if not product.image:
+                continue
+            size = pick_size(product.image_sizes, width)
+            try:
+                raw = storage.download(derivative_key(product.image, size) if size else product.image)
+                encoded = {
+                    fmt: render_width(BytesIO(raw), width, fmt=fmt, profile=encoder_profile(context='upload'))
+                    for fmt in IMAGE_FORMATS
+                }
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{product.name}: {e}")
+                continue
+            measured += 1
+            for fmt, data in encoded.items():
+                totals[fmt] += len(data)
+
+        self.stdout.write(
+            f"Primera página del catálogo: {len(products)} productos, {measured} imágenes "
+            f"medidas a {width} px" + (f", {failed} con error" if failed else '')
+        )
+        if not measured:
+            return
+        self.stdout.write(f"{'formato':<8} {'por página':>11} {'por imagen':>11} {'vs JPEG':>8} {'vs WebP':>8}")
+        for fmt in IMAGE_FORMATS:
+            total = totals[fmt]
+            self.stdout.write(
+                f"{fmt:<8} {total / 1024:>9.1f}KB {total / measured / 1024:>9.1f}KB "
+                f"{(total / totals['jpeg'] - 1) * 100:>+7.0f}% {(total / totals['webp'] - 1) * 100:>+7.0f}%"
+            )
+
+    def _samples(self, paths):
+        if not paths:
+            return [('sintética 4032x3024.jpg', sample_photo())]
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, name) for name in sorted(os.listdir(path))
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+                )
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                raise CommandError(f"No existe: {path}")
+        samples = []
+        for path in files:
+            with open(path, 'rb') as f:
+                samples.append((os.path.basename(path), f.read()))
+        return samples
@@ -0,0 +1,198 @@
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.catalog import bump_catalog_version
+from products.images import ENCODER_PROFILES, ImageRejected, encoder_profile, process_image_bytes
+from products.models import Product
+from products.storage import get_image_storage
+from products.tasks import schedule_image_delete
+
+
+class Command(BaseCommand):
+    help = (
+        'Recodifica las imágenes de productos ya guardadas con el pipeline actual '
+        '(original WebP, tamaños derivados y formatos de PRODUCT_IMAGE_FORMATS). '
+        'Codifica en un pool de procesos, descarga y sube en paralelo y guarda el '
+        'avance en un archivo para continuar si se interrumpe'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recodifica también las que ya tienen todos los formatos')
+        parser.add_argument('--profile', choices=sorted(ENCODER_PROFILES),
+                            help='Perfil de codificación (por defecto el del contexto regenerate)')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Procesos que codifican (por defecto uno por núcleo)')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Imágenes descargándose/subiéndose a la vez (por defecto 2 por proceso)')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Productos por lote; el avance se guarda al terminar cada lote')
+        parser.add_argument('--checkpoint', default='reencode_images.json',
+                            help='Archivo donde se guarda el avance (por defecto reencode_images.json)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignora el avance guardado y empieza desde el primer producto')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--processes y --batch-size deben ser mayores que 0')
+        self.profile = encoder_profile(options['profile'], 'regenerate')
+        self.formats = set(settings.PRODUCT_IMAGE_FORMATS)
+        self.storage = get_image_storage()
+        self.pool_broken = False
+
+        path = options['checkpoint']
+        state = {'last_pk': 0, 'reencoded': 0, 'updated': 0, 'failed': []}
+        if not options['restart'] and os.path.exists(path):
+            with open(path) as f:
+                state.update(json.load(f))
+            self.stdout.write(f"Continuando después del producto #{state['last_pk']}")
+
+        products = (
+            Product.objects.exclude(image__isnull=True).exclude(image='')
+            .exclude(image_status='processing').order_by('pk')
+        )
+        remaining = products.filter(pk__gt=state['last_pk']).count()
+        self.stdout.write(
+            f"{remaining} productos por revisar con el perfil {self.profile.name}, "
+            f"{options['processes']} procesos"
+        )
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        # ``spawn``: los procesos no heredan las conexiones ni los hilos de
+        # este; solo codifican, sin tocar la base de datos. Ctrl+C lo maneja
+        # este proceso: termina el lote y guarda el avance
+        self.processes = ProcessPoolExecutor(
+            options['processes'], mp_context=multiprocessing.get_context('spawn'),
+            initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN),
+        )
+        threads = ThreadPoolExecutor(options['concurrency'] or options['processes'] * 2)
+        started = time.monotonic()
+        try:
+            while not self.stopping:
+                rows = list(
+                    products.filter(pk__gt=state['last_pk'])
+                    .values('pk', 'image', 'image_formats')[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                keys = {row['image'] for row in rows if options['all'] or self._outdated(row)}
+                results, failed = self._reencode(threads, keys)
+                if self.pool_broken:
+                    raise CommandError('Un proceso de codificación terminó inesperadamente; vuelve a ejecutar el comando')
+                updated = self._apply(rows, results)
+
+                state['last_pk'] = rows[-1]['pk']
+                state['reencoded'] += len(results)
+                state['updated'] += updated
+                state['failed'] += [row['pk'] for row in rows if row['image'] in failed]
+                self._save_checkpoint(path, state)
+                self.stdout.write(
+                    f"Hasta #{state['last_pk']}: {len(results)} imágenes recodificadas, "
+                    f"{updated} productos actualizados, {len(failed)} con error"
+                )
+        finally:
+            threads.shutdown(cancel_futures=True)
+            self.processes.shutdown(cancel_futures=True)
+
+        self.stdout.write(
+            f"{'Interrumpido' if self.stopping else 'Terminado'} en {time.monotonic() - started:.0f} s: "
+            f"{state['reencoded']} imágenes recodificadas, {state['updated']} productos actualizados, "
+            f"{len(state['failed'])} con error"
+        )
+        if state['failed']:
+            self.stdout.write(f"Productos con error: {', '.join(map(str, state['failed']))}")
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        self.stdout.write('Deteniendo al terminar el lote en curso…')
+
+    def _outdated(self, row):
+        """Le faltan formatos: guardada por el pipeline anterior o sin derivados"""
+        return not self.formats <= set(row['image_formats'] or ())
+
+    def _reencode(self, threads, keys):
+        """
+        Descarga, recodifica y sube cada llave. Devuelve
+        ``({llave_anterior: (key, sizes, formats)}, {llave_anterior: error})``
+        """
+        futures = {threads.submit(self._reencode_one, key): key for key in keys}
+        results, failed = {}, {}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as exc:
+                failed[key] = exc
+                self.stderr.write(f"❌ {key}: {exc}")
+        return results, failed
+
+    def _reencode_one(self, key):
+        upload = BytesIO(self.storage.download(key))
+        return self.storage.save_image(os.path.basename(key), upload, profile=self.profile, encode=self._encode)
+
+    def _encode(self, content, profile=None):
+        try:
+            outputs = self.processes.submit(process_image_bytes, content.getvalue(), profile).result()
+        except ImageRejected:
+            raise
+        except Exception as exc:
+            if isinstance(exc, BrokenProcessPool):
+                self.pool_broken = True
+            # No se sube como binario: el producto conserva la imagen anterior
+            raise ImageRejected(f"No se pudo recodificar: {exc}") from exc
+        yield from outputs
+
+    def _apply(self, rows, results):
+        """
+        Apunta los productos del lote a las imágenes nuevas en un solo
+        ``bulk_update`` y suelta las anteriores. Los que cambiaron de imagen
+        mientras tanto se dejan como están.
+        """
+        if not results:
+            return 0
+        pks = [row['pk'] for row in rows if row['image'] in results]
+        with transaction.atomic():
+            products = list(
+                Product.objects.select_for_update()
+                .filter(pk__in=pks, image__in=list(results))
+                .exclude(image_status='processing')
+            )
+            uses = Counter()
+            for product in products:
+                previous = product.image
+                product.image, product.image_sizes, product.image_formats = results[previous]
+                uses[previous] += 1
+                schedule_image_delete(previous)
+            Product.objects.bulk_update(products, ['image', 'image_sizes', 'image_formats'])
+
+            # ``save_image`` dejó una referencia por imagen nueva; una por producto
+            for previous, (key, _, _) in results.items():
+                if uses[previous]:
+                    self.storage.add_references(key, uses[previous] - 1)
+                else:
+                    schedule_image_delete(key)
+
+            if products:
+                # ``bulk_update`` no dispara las señales del modelo
+                transaction.on_commit(bump_catalog_version)
+        return len(products)
+
+    def _save_checkpoint(self, path, state):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_sizes',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Tamaños de imagen'),
+        ),
+    ]
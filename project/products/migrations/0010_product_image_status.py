@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_image_sizes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_status',
+            field=models.CharField(choices=[('ready', 'Lista'), ('processing', 'Procesando'), ('failed', 'Error al procesar')], default='ready', editable=False, max_length=20, verbose_name='Estado de la imagen'),
+        ),
+    ]
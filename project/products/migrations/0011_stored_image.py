@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_image_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='SHA-256')),
+                ('key', models.CharField(max_length=500, unique=True, verbose_name='Llave')),
+                ('sizes', models.JSONField(blank=True, default=list, verbose_name='Tamaños derivados')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Referencias')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Imagen almacenada',
+                'verbose_name_plural': 'Imágenes almacenadas',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_stored_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_formats',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Formatos de imagen'),
+        ),
+        migrations.AddField(
+            model_name='storedimage',
+            name='formats',
+            field=models.JSONField(blank=True, default=list, verbose_name='Formatos'),
+        ),
+    ]
@@ -4,7 +4,7 @@ from django.core.validators import MinValueValidator
 from decimal import Decimal, ROUND_HALF_UP
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from django.conf import settings
+from .images import fallback_format, image_srcset, image_url, public_url, resized_url
 
 class Category(models.Model):
     name = models.CharField('Nombre', max_length=100)
@@ -25,6 +25,12 @@ class Category(models.Model):
 
 
 class Product(models.Model):
+    IMAGE_STATUS = [
+        ('ready', 'Lista'),
+        ('processing', 'Procesando'),
+        ('failed', 'Error al procesar'),
+    ]
+
     name = models.CharField('Nombre', max_length=200)
     description = models.TextField('Descripción', blank=True)
     price = models.DecimalField(
@@ -44,7 +50,31 @@ class Product(models.Model):
         'Imagen',
         max_length=500,
         blank=True,
-        null=True
+        null=True,
+        # /img/ busca el producto por llave en cada variante que no está en cache
+        db_index=True
+    )
+    # Anchos derivados que existen en el storage (ver products.images)
+    image_sizes = models.JSONField(
+        'Tamaños de imagen',
+        default=list,
+        blank=True,
+        editable=False
+    )
+    # Formatos en que están guardados los derivados (vacío = solo WebP)
+    image_formats = models.JSONField(
+        'Formatos de imagen',
+        default=list,
+        blank=True,
+        editable=False
+    )
+    # La conversión y subida de una imagen nueva las hace el worker (products.tasks)
+    image_status = models.CharField(
+        'Estado de la imagen',
+        max_length=20,
+        choices=IMAGE_STATUS,
+        default='ready',
+        editable=False
     )
     is_available = models.BooleanField(default=True, verbose_name="Disponible")
     weight = models.PositiveIntegerField(
@@ -65,6 +95,11 @@ class Product(models.Model):
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['category__name', 'name']
+        indexes = [
+            # Paginación keyset del listado en modo server (con y sin categoría)
+            models.Index(fields=['is_available', 'name', 'id'], name='product_available_name_idx'),
+            models.Index(fields=['category', 'is_available', 'name', 'id'], name='product_cat_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -79,20 +114,52 @@ class Product(models.Model):
         return f"${self.price:,.0f}"
 
     def image_secure_url(self):
-        if self.image:
-            return f"{settings.SUPABASE_URL}/storage/v1/object/public/{settings.SUPABASE_BUCKET}/{self.image}"
-        return ""
+        return public_url(self.image)
+
+    def image_url(self, size=None, fmt='webp'):
+        """URL del menor tamaño derivado de al menos ``size`` px (o del original)"""
+        return image_url(self.image, self.image_sizes, size, fmt)
+
+    def image_srcset(self, fmt='webp'):
+        return image_srcset(self.image, self.image_sizes, fmt)
+
+    @property
+    def image_fallback_format(self):
+        return fallback_format(self.image_formats)
+
+    def image_resized_url(self, width, quality=None):
+        """URL de la imagen redimensionada al vuelo (``/img/``) a ``width`` px"""
+        return resized_url(self.image, width, quality)
+
+
+class StoredImage(models.Model):
+    """
+    Objeto del storage direccionado por contenido (ver products.storage) y
+    cuántos productos lo usan. Se borra del storage con la última referencia.
+    """
+    # Vacío en imágenes subidas antes del modo por contenido que se volvieron compartidas
+    digest = models.CharField('SHA-256', max_length=64, unique=True, null=True, blank=True)
+    key = models.CharField('Llave', max_length=500, unique=True)
+    sizes = models.JSONField('Tamaños derivados', default=list, blank=True)
+    formats = models.JSONField('Formatos', default=list, blank=True)
+    references = models.PositiveIntegerField('Referencias', default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Imagen almacenada'
+        verbose_name_plural = 'Imágenes almacenadas'
+
+    def __str__(self):
+        return self.key
 
 
 @receiver(post_delete, sender=Product)
-def delete_product_image(sender, instance, **kwargs):
+def delete_product_image(sender, instance, using, **kwargs):
     if instance.image:
-        try:
-            from .supabase_storage import SupabaseStorage
-            storage = SupabaseStorage()
-            storage.delete(instance.image)
-        except Exception:
-            pass
+        # Se borra en lote al confirmar la transacción (products.tasks)
+        from .tasks import schedule_image_delete
+        schedule_image_delete(instance.image, using=using)
 
 
 
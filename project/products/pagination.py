@@ -0,0 +1,70 @@
+"""
+Paginación por cursor del listado de productos para catálogos grandes: keyset
+sobre la BD sin búsqueda y por posición sobre los resultados de la búsqueda.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(product):
+    """Token opaco con la llave ``(name, id)`` del último producto mostrado"""
+    raw = json.dumps([product.name, product.pk], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Devuelve ``(name, id)`` o None si el token no es válido"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        name, pk = json.loads(base64.urlsafe_b64decode(padded).decode())
+        if not isinstance(name, str):
+            return None
+        return name, int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def paginate_products(queryset, token, per_page=24):
+    """
+    Devuelve ``(productos, siguiente_cursor)`` en orden ``name, id``.
+
+    Cada página es un rango sobre los índices ``(is_available, name, id)`` y
+    ``(category, is_available, name, id)``, sin COUNT ni OFFSET, así que pedir
+    la página 1 o la 200 cuesta lo mismo. Un token inválido devuelve la
+    primera página; ``siguiente_cursor`` es ``''`` en la última.
+    """
+    cursor = decode_cursor(token)
+    if cursor is not None:
+        name, pk = cursor
+        queryset = queryset.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+
+    rows = list(queryset.order_by('name', 'id')[:per_page + 1])
+    products = rows[:per_page]
+    next_cursor = encode_cursor(products[-1]) if len(rows) > per_page else ''
+    return products, next_cursor
+
+
+def paginate_results(results, token, per_page=24):
+    """
+    Devuelve ``(productos, siguiente_cursor)`` sobre una lista ya ordenada
+    (los resultados de la búsqueda, por relevancia). El cursor es la posición
+    del siguiente; uno inválido devuelve la primera página.
+    """
+    try:
+        padded = (token or '') + '=' * (-len(token or '') % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded).decode())['offset'])
+    except (ValueError, TypeError, KeyError, UnicodeDecodeError):
+        offset = 0
+    offset = max(offset, 0)
+
+    products = results[offset:offset + per_page]
+    next_cursor = ''
+    if len(results) > offset + per_page:
+        raw = json.dumps({'offset': offset + per_page})
+        next_cursor = base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+    return products, next_cursor
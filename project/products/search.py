@@ -0,0 +1,261 @@
+"""
+Índice de búsqueda de productos en memoria.
+
+Índice invertido sobre nombre, categoría, descripción e ingredientes de los
+productos del snapshot del catálogo, con:
+
+- plegado de tildes y minúsculas ("Almojábana" == "almojabana", "ñ" == "n"),
+- coincidencia por prefijo ("almo" encuentra "almojabana"),
+- coincidencia aproximada por trigramas para errores de digitación
+  ("almojavana" encuentra "almojabana").
+
+Cada worker mantiene su propio índice. Las señales de productos/categorías
+cambian la versión del catálogo; cuando el índice detecta una versión nueva
+compara el snapshot anterior con el nuevo y reindexa solo los productos que
+cambiaron, en vez de reconstruirlo completo.
+"""
+
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+from .catalog import get_catalog
+
+# Peso de cada campo en el puntaje (se queda el mayor si un término se repite)
+FIELD_WEIGHTS = (
+    ('name', 3.0),
+    ('category', 2.0),
+    ('description', 1.0),
+    ('ingredients', 1.0),
+)
+# Factor del puntaje según el tipo de coincidencia (exacta = 1)
+PREFIX_FACTOR = 0.8
+FUZZY_FACTOR = 0.5
+
+MIN_PREFIX_LENGTH = 2
+# Máximo de palabras del vocabulario que puede abarcar un prefijo
+MAX_PREFIX_EXPANSIONS = 64
+MIN_FUZZY_LENGTH = 3
+# Similitud de Jaccard mínima entre los trigramas del término y la palabra
+FUZZY_THRESHOLD = 0.45
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Minúsculas y sin tildes"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex:
+    """Índice invertido de los productos disponibles del catálogo"""
+
+    def __init__(self):
+        self.version = None
+        self._docs = {}        # id -> (CatalogProduct, {palabra: peso})
+        self._postings = {}    # palabra -> {id: peso}
+        self._vocabulary = []  # palabras ordenadas, para buscar prefijos
+        self._trigrams = {}    # trigrama -> {palabras}
+        self._word_grams = {}  # palabra -> sus trigramas
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+
+    def sync(self, snapshot):
+        """Lleva el índice al snapshot dado reindexando solo las diferencias"""
+        with self._lock:
+            current = {product.id: product for product in snapshot.products}
+            bulk = not self._docs
+
+            for product_id in [pid for pid in self._docs if pid not in current]:
+                self.remove(product_id)
+            for product_id, product in current.items():
+                entry = self._docs.get(product_id)
+                # Los productos del snapshot son inmutables y se comparan por valor
+                if entry is None or entry[0] != product:
+                    self.add(product, _bulk=bulk)
+
+            if bulk:
+                self._vocabulary.sort()
+            self.version = snapshot.version
+
+    def add(self, product, _bulk=False):
+        with self._lock:
+            self.remove(product.id)
+            tokens = self._document_tokens(product)
+            self._docs[product.id] = (product, tokens)
+            for token, weight in tokens.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    self._add_word(token, _bulk)
+                postings[product.id] = weight
+
+    def remove(self, product_id):
+        with self._lock:
+            entry = self._docs.pop(product_id, None)
+            if entry is None:
+                return
+            for token in entry[1]:
+                postings = self._postings[token]
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+                    self._remove_word(token)
+
+    def _document_tokens(self, product):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            text = product.category.name if field == 'category' else getattr(product, field)
+            for token in tokenize(text):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+        return weights
+
+    def _add_word(self, token, bulk):
+        if bulk:
+            # En la carga inicial se ordena una sola vez al final
+            self._vocabulary.append(token)
+        else:
+            bisect.insort(self._vocabulary, token)
+        grams = frozenset(trigrams(token))
+        self._word_grams[token] = grams
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(token)
+
+    def _remove_word(self, token):
+        index = bisect.bisect_left(self._vocabulary, token)
+        if index < len(self._vocabulary) and self._vocabulary[index] == token:
+            del self._vocabulary[index]
+        for gram in self._word_grams.pop(token):
+            words = self._trigrams.get(gram)
+            if words is not None:
+                words.discard(token)
+                if not words:
+                    del self._trigrams[gram]
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+
+    def _expand(self, term):
+        """Palabras del índice que corresponden a ``term``, con su factor"""
+        matches = {}
+        if term in self._postings:
+            matches[term] = 1.0
+
+        if len(term) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self._vocabulary, term)
+            for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not token.startswith(term):
+                    break
+                matches.setdefault(token, PREFIX_FACTOR)
+
+        if not matches and len(term) >= MIN_FUZZY_LENGTH:
+            matches.update(self._fuzzy_matches(term))
+        return matches
+
+    def _fuzzy_matches(self, term):
+        """
+        Palabras con similitud de trigramas >= ``FUZZY_THRESHOLD``.
+
+        Una palabra similar comparte al menos ``ceil(umbral * n)`` de los ``n``
+        trigramas del término, así que basta con recorrer los ``n - k + 1``
+        trigramas menos frecuentes para encontrar todas las candidatas; la
+        similitud exacta se calcula solo para ellas.
+        """
+        grams = trigrams(term)
+        size = len(grams)
+        required = math.ceil(FUZZY_THRESHOLD * size)
+        rarest = sorted(grams, key=lambda gram: len(self._trigrams.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:size - required + 1]:
+            candidates.update(self._trigrams.get(gram, ()))
+
+        # Fuera de este rango de tamaños la similitud no puede alcanzar el umbral
+        min_size, max_size = FUZZY_THRESHOLD * size, size / FUZZY_THRESHOLD
+        matches = {}
+        for token in candidates:
+            token_grams = self._word_grams[token]
+            token_size = len(token_grams)
+            if not min_size <= token_size <= max_size:
+                continue
+            shared = len(grams & token_grams)
+            similarity = shared / (size + token_size - shared)
+            if similarity >= FUZZY_THRESHOLD:
+                matches[token] = FUZZY_FACTOR * similarity
+        return matches
+
+    def search(self, query, category=None, limit=None):
+        """
+        Productos que contienen todos los términos de ``query``, del más al
+        menos relevante (a igual puntaje, por nombre).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, factor in self._expand(term).items():
+                    for product_id, weight in self._postings[token].items():
+                        score = weight * factor
+                        if score > term_scores.get(product_id, 0):
+                            term_scores[product_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        product_id: score + term_scores[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+            products = [(self._docs[product_id][0], score) for product_id, score in scores.items()]
+
+        if category:
+            products = [item for item in products if item[0].category.slug == category]
+        order = lambda item: (-item[1], item[0].name)  # noqa: E731
+        if limit and limit < len(products):
+            products = heapq.nsmallest(limit, products, key=order)
+        else:
+            products.sort(key=order)
+        return [product for product, _ in products]
+
+
+_index = ProductSearchIndex()
+
+
+def get_search_index():
+    """Índice sincronizado con la versión vigente del catálogo"""
+    snapshot = get_catalog()
+    if _index.version != snapshot.version:
+        _index.sync(snapshot)
+    return _index
+
+
+def search_products(query, category=None, limit=None):
+    """Busca en el catálogo; devuelve ``CatalogProduct`` ordenados por relevancia"""
+    return get_search_index().search(query, category=category, limit=limit)
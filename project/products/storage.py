@@ -0,0 +1,297 @@
+"""
+Storages de imágenes de productos.
+
+``ProductImageStorage`` tiene la lógica común (conversión a WebP, tamaños
+derivados, llaves); cada backend implementa solo las operaciones sobre
+objetos. ``settings.PRODUCT_IMAGE_STORAGE`` elige el backend:
+``SupabaseStorage`` en producción o ``LocalImageStorage`` (archivos en
+``MEDIA_ROOT``) para desarrollo y pruebas sin Supabase.
+
+Con ``PRODUCT_IMAGE_DEDUPLICATE`` las imágenes se guardan por hash del
+contenido (``products/ab/abcd….webp``) y se cuentan sus referencias en
+``StoredImage``: subir otra vez la misma imagen o duplicar un producto no
+toca el storage, y el objeto se borra cuando el último producto lo suelta.
+"""
+
+import hashlib
+import os
+import time
+from collections import Counter
+from contextlib import closing
+from functools import partial
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.storage import Storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .images import (
+    FORMAT_CONTENT_TYPES, IMAGE_FORMATS, IMAGE_SIZES, ImageRejected, image_content_type,
+    derivative_key, process_image, stored_formats,
+)
+from .models import StoredImage
+
+
+class ProductImageStorage(Storage):
+    base_path = "products"
+
+    # ------------------------------------------------------------------
+    # Operaciones que implementa cada backend
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def public_url(cls, key):
+        raise NotImplementedError
+
+    def upload(self, key, data, content_type):
+        raise NotImplementedError
+
+    def download(self, key):
+        raise NotImplementedError
+
+    def remove(self, keys):
+        """Borra los objetos; las llaves que no existan se ignoran"""
+        raise NotImplementedError
+
+    def copy_object(self, source, target):
+        self.upload(target, self.download(source), image_content_type(target))
+
+    # ------------------------------------------------------------------
+    # API común
+    # ------------------------------------------------------------------
+
+    def _save(self, name, content):
+        key, _, _ = self.save_image(name, content)
+        return key
+
+    @property
+    def deduplicate(self):
+        return settings.PRODUCT_IMAGE_DEDUPLICATE
+
+    def save_image(self, name, content, profile=None, encode=process_image):
+        """
+        Sube la imagen convertida a WEBP junto con sus tamaños derivados en
+        cada formato (ver ``products.images``). Devuelve
+        ``(key, anchos_generados, formatos)``.
+
+        En modo por contenido la llave es el SHA-256 de lo subido: si esa
+        imagen ya está en el storage no se convierte ni se sube de nuevo,
+        solo se suma una referencia.
+
+        ``profile`` es el perfil de codificación (ver ``products.images``) y
+        ``encode(content, profile=...)`` produce las versiones como
+        ``process_image`` (``reencode_images`` codifica en otro proceso).
+        Lanza ``ImageRejected`` si la imagen supera el máximo de megapíxeles.
+        """
+        filename = os.path.basename(name)
+        name_wo_ext, ext = os.path.splitext(filename)
+
+        digest = None
+        if self.deduplicate:
+            # Por bloques, sin copiar el archivo completo a memoria
+            content.seek(0)
+            digest = hashlib.file_digest(content, "sha256").hexdigest()
+            stored = self._acquire(digest=digest)
+            if stored is not None:
+                return stored.key, stored.sizes, stored.formats
+            prefix = f"{self.base_path}/{digest[:2]}/{digest}"
+        else:
+            prefix = f"{self.base_path}/{uuid4().hex}-{name_wo_ext}"
+
+        content.seek(0)
+        # ``closing``: si una subida falla, la imagen decodificada se libera ya
+        with closing(encode(content, profile=profile)) as outputs:
+            try:
+                _, _, data = next(outputs)
+            except ImageRejected:
+                raise
+            except Exception:
+                # Si no es imagen válida, subir como binario
+                key = f"{prefix}{ext}"
+                content_type = getattr(content, "content_type", None) or "application/octet-stream"
+                content.seek(0)
+                self.upload(key, content.read(), content_type)
+                sizes, formats = [], []
+            else:
+                key = f"{prefix}.webp"
+                self.upload(key, data, "image/webp")
+                del data
+                sizes, formats = set(), set()
+                for size, fmt, data in outputs:
+                    self.upload(derivative_key(key, size, fmt), data, FORMAT_CONTENT_TYPES[fmt])
+                    sizes.add(size)
+                    formats.add(fmt)
+                sizes, formats = sorted(sizes), stored_formats(formats)
+
+        if digest is not None:
+            stored = self._register(key, sizes, formats, digest=digest)
+            return stored.key, stored.sizes, stored.formats
+        return key, sizes, formats
+
+    def url(self, name):
+        return self.public_url(name)
+
+    def delete(self, name):
+        if name:
+            self.delete_many([name])
+
+    def delete_many(self, names):
+        """
+        Suelta una referencia por cada nombre y borra, en una sola llamada,
+        las imágenes (con sus tamaños derivados) que ya nadie usa. Las que no
+        están registradas como compartidas se borran directamente.
+
+        Las referencias se descuentan en una transacción corta; el borrado en
+        el storage (una llamada de red) corre al confirmarla, sin retener los
+        registros bloqueados. Si falla, reintentar es seguro: las llaves ya no
+        están registradas y se borran directamente.
+        """
+        counts = Counter(name for name in names if name)
+        if not counts:
+            return
+        with transaction.atomic():
+            # Bloqueadas hasta confirmar: una subida de la misma imagen espera
+            # y, si el registro desaparece, la vuelve a subir
+            shared = {
+                stored.key: stored
+                for stored in StoredImage.objects.select_for_update().filter(key__in=counts)
+            }
+            unused = [name for name in counts if name not in shared]
+            released = []
+            for key, stored in shared.items():
+                stored.references = max(stored.references - counts[key], 0)
+                if stored.references:
+                    stored.save(update_fields=['references', 'updated_at'])
+                else:
+                    released.append(stored.pk)
+                    unused.append(key)
+            StoredImage.objects.filter(pk__in=released).delete()
+            if unused:
+                transaction.on_commit(partial(self._remove_unused, unused))
+
+    def _remove_unused(self, names):
+        # Una subida de la misma imagen pudo registrarla de nuevo entre la
+        # confirmación y este punto: esa se conserva
+        reused = set(StoredImage.objects.filter(key__in=names).values_list('key', flat=True))
+        self.remove([
+            key
+            for name in names if name not in reused
+            for key in [name] + [
+                derivative_key(name, size, fmt)
+                for size in IMAGE_SIZES
+                for fmt in IMAGE_FORMATS
+            ]
+        ])
+
+    def copy(self, name, sizes=(), formats=()):
+        if not name:
+            return ""
+        if self.deduplicate:
+            # El duplicado comparte el objeto: solo una referencia más, sin I/O
+            return self._acquire(key=name, sizes=sizes, formats=formats).key
+        filename = os.path.basename(name)
+        new_key = f"{self.base_path}/{uuid4().hex}-{filename}"
+        self.copy_object(name, new_key)
+        for size in sizes:
+            for fmt in stored_formats(formats):
+                self.copy_object(derivative_key(name, size, fmt), derivative_key(new_key, size, fmt))
+        return new_key
+
+    # ------------------------------------------------------------------
+    # Referencias de imágenes compartidas
+    # ------------------------------------------------------------------
+
+    def _acquire(self, digest=None, key=None, sizes=(), formats=()):
+        """
+        Suma una referencia a la imagen registrada con ``digest``/``key``.
+        Por ``digest`` devuelve None si no existe; por ``key`` registra como
+        compartida una imagen anterior (su producto + el nuevo = 2).
+        """
+        lookup = {'digest': digest} if digest is not None else {'key': key}
+        with transaction.atomic():
+            updated = StoredImage.objects.filter(**lookup).update(
+                references=F('references') + 1, updated_at=timezone.now(),
+            )
+            if updated:
+                return StoredImage.objects.get(**lookup)
+        if digest is not None:
+            return None
+        return self._register(key, list(sizes), list(formats), references=2)
+
+    def add_references(self, key, count):
+        """Suma ``count`` referencias a ``key`` (más productos pasan a usarla)"""
+        if self.deduplicate and count:
+            StoredImage.objects.filter(key=key).update(
+                references=F('references') + count, updated_at=timezone.now(),
+            )
+
+    def _register(self, key, sizes, formats, digest=None, references=1):
+        try:
+            with transaction.atomic():
+                return StoredImage.objects.create(
+                    digest=digest, key=key, sizes=sizes, formats=formats, references=references,
+                )
+        except IntegrityError:
+            # Otro proceso registró la misma imagen al mismo tiempo
+            lookup = {'digest': digest} if digest is not None else {'key': key}
+            StoredImage.objects.filter(**lookup).update(
+                references=F('references') + references, updated_at=timezone.now(),
+            )
+            return StoredImage.objects.get(**lookup)
+
+
+class LocalImageStorage(ProductImageStorage):
+    """
+    Guarda las imágenes en ``MEDIA_ROOT`` (servidas en ``MEDIA_URL`` con DEBUG).
+
+    ``latency`` (o ``settings.LOCAL_IMAGE_STORAGE_LATENCY``) agrega esa
+    cantidad de segundos a cada operación para simular la red al medir.
+    """
+
+    def __init__(self, location=None, latency=None):
+        self.location = str(location or settings.MEDIA_ROOT)
+        self.latency = settings.LOCAL_IMAGE_STORAGE_LATENCY if latency is None else latency
+
+    def _simulate_network(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    @classmethod
+    def public_url(cls, key):
+        return f"{settings.MEDIA_URL}{key}"
+
+    def path(self, key):
+        return os.path.join(self.location, *key.split("/"))
+
+    def upload(self, key, data, content_type):
+        self._simulate_network()
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def download(self, key):
+        self._simulate_network()
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def remove(self, keys):
+        self._simulate_network()
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+
+def get_image_storage():
+    """Instancia del storage de imágenes configurado"""
+    return import_string(settings.PRODUCT_IMAGE_STORAGE)()
@@ -0,0 +1,152 @@
+"""
+Cliente de Supabase Storage compartido por todo el proceso.
+
+``create_client`` arma clientes HTTP nuevos (y sesiones TLS nuevas) cada vez
+que se llama, y antes se llamaba en cada ``SupabaseStorage()``. Aquí el
+cliente se crea una sola vez por proceso, al primer uso y protegido con un
+lock, sobre un ``httpx.Client`` (seguro entre hilos) con pool de conexiones
+keep-alive y timeouts configurables en ``SUPABASE_STORAGE``:
+
+- ``timeout`` / ``connect_timeout``: segundos por operación / para conectar.
+- ``pool_size``: conexiones keep-alive máximas.
+- ``max_retries``: reintentos ante errores de red, timeouts, 429 y 5xx.
+
+``call`` ejecuta cada operación con esa política de reintentos y registra su
+latencia; ``storage_stats()`` devuelve las métricas del proceso.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+from django.conf import settings
+from storage3.exceptions import StorageApiError
+from supabase import ClientOptions, create_client
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# Espera antes del primer reintento; se duplica en cada intento
+RETRY_BACKOFF = 0.2
+# Latencias recientes que se guardan por operación para los percentiles
+LATENCY_SAMPLES = 200
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente de Supabase del proceso (se recrea si el proceso se bifurcó)"""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = _create_client()
+                _client_pid = os.getpid()
+    return _client
+
+
+def _create_client():
+    cfg = settings.SUPABASE_STORAGE
+    pool_size = int(cfg.get("pool_size", 10))
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(cfg.get("timeout", 30), connect=cfg.get("connect_timeout", 5)),
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=60,
+        ),
+        follow_redirects=True,
+        http2=True,
+    )
+    return create_client(
+        cfg["url"],
+        cfg["service_role_key"],
+        options=ClientOptions(httpx_client=http_client),
+    )
+
+
+class _OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def as_dict(self):
+        samples = sorted(self.samples)
+
+        def percentile(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'avg_ms': round(self.total / self.count * 1000, 1) if self.count else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(self.max * 1000, 1),
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(operation, elapsed, error=False, retry=False):
+    with _stats_lock:
+        stats = _stats.get(operation)
+        if stats is None:
+            stats = _stats[operation] = _OperationStats()
+        stats.count += 1
+        stats.errors += error
+        stats.retries += retry
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        stats.samples.append(elapsed)
+
+
+def _is_retryable(exc):
+    if isinstance(exc, httpx.TransportError):
+        # Errores de red y timeouts
+        return True
+    if isinstance(exc, StorageApiError):
+        try:
+            return int(exc.status) in RETRY_STATUSES
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def call(operation, func, *args, **kwargs):
+    """Ejecuta ``func`` con reintentos y registra la latencia en ``operation``"""
+    attempts = int(settings.SUPABASE_STORAGE.get("max_retries", 2)) + 1
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            retry = attempt + 1 < attempts and _is_retryable(exc)
+            _record(operation, time.perf_counter() - started, error=True, retry=retry)
+            if not retry:
+                raise
+            logger.warning("Supabase %s falló (intento %s/%s): %s", operation, attempt + 1, attempts, exc)
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            continue
+        _record(operation, time.perf_counter() - started)
+        return result
+
+
+def storage_stats():
+    """Latencias y errores por operación de este proceso"""
+    with _stats_lock:
+        return {operation: stats.as_dict() for operation, stats in sorted(_stats.items())}
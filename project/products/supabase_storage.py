@@ -1,64 +1,51 @@
-import os
-from uuid import uuid4
-from io import BytesIO
 from django.conf import settings
-from django.core.files.storage import Storage
-from supabase import create_client
-from PIL import Image
+from storage3.exceptions import StorageApiError
+
+from .images import image_content_type
+from .storage import ProductImageStorage
+from .supabase_client import call, get_client
+
+class SupabaseStorage(ProductImageStorage):
+    """
+    Imágenes en un bucket de Supabase. Instanciarla es gratis: todas las
+    instancias usan el cliente compartido del proceso (ver supabase_client).
+    """
 
-class SupabaseStorage(Storage):
     def __init__(self):
         cfg = settings.SUPABASE_STORAGE
-        self.client = create_client(cfg["url"], cfg["service_role_key"])
         self.bucket = cfg["bucket"]
         self.base_path = cfg.get("base_path", "products")
 
-    def _save(self, name, content):
-        filename = os.path.basename(name)
-        name_wo_ext, _ = os.path.splitext(filename)
-        key = f"{self.base_path}/{uuid4().hex}-{name_wo_ext}.webp"
+    @property
+    def client(self):
+        return get_client()
 
-        content.seek(0)
-        raw = content.read()
+    def _bucket(self):
+        return self.client.storage.from_(self.bucket)
 
-        # Intentar convertir a WEBP
-        try:
-            img = Image.open(BytesIO(raw))
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            out = BytesIO()
-            img.save(out, format="WEBP", quality=85, method=6)
-            out.seek(0)
-            file_data = out.read()
-            content_type = "image/webp"
-        except Exception:
-            # Si no es imagen válida, subir como binario
-            file_data = raw
-            content_type = getattr(content, "content_type", "application/octet-stream")
-            key = f"{self.base_path}/{uuid4().hex}-{filename}"
+    @classmethod
+    def public_url(cls, key):
+        return f"{settings.SUPABASE_URL}/storage/v1/object/public/{settings.SUPABASE_BUCKET}/{key}"
 
-        self.client.storage.from_(self.bucket).upload(
-            key,
-            file_data,
-            {"content-type": content_type},
-        )
-        return key
+    def upload(self, key, data, content_type):
+        # Las llaves son únicas: con upsert, reintentar una subida que sí
+        # alcanzó a llegar no falla por archivo duplicado
+        call("upload", self._bucket().upload, key, data, {"content-type": content_type, "upsert": "true"})
 
-    def url(self, name):
-        return f"{settings.SUPABASE_URL}/storage/v1/object/public/{self.bucket}/{name}"
+    def download(self, key):
+        try:
+            return call("download", self._bucket().download, key)
+        except StorageApiError as exc:
+            # Como en los demás backends: el objeto que no existe es FileNotFoundError
+            if str(exc.status) == "404" or exc.code in ("not_found", "NoSuchKey"):
+                raise FileNotFoundError(key) from exc
+            raise
 
-    def delete(self, name):
-        if name:
-            self.client.storage.from_(self.bucket).remove([name])
+    def remove(self, keys):
+        call("remove", self._bucket().remove, keys)
 
-    def copy(self, name):
-        if not name:
-            return ""
-        filename = os.path.basename(name)
-        new_key = f"{self.base_path}/{uuid4().hex}-{filename}"
+    def copy_object(self, source, target):
         try:
-            self.client.storage.from_(self.bucket).copy(name, new_key)
+            call("copy", self._bucket().copy, source, target)
         except Exception:
-            data = self.client.storage.from_(self.bucket).download(name)
-            self.client.storage.from_(self.bucket).upload(new_key, data)
-        return new_key
\ No newline at end of file
+            self.upload(target, self.download(source), image_content_type(target))
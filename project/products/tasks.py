@@ -0,0 +1,145 @@
+"""
+Tareas en segundo plano de las imágenes de productos (ver ``core.jobs``).
+
+El admin encola la imagen subida y responde de inmediato; el producto queda
+con ``image_status='processing'`` y sigue mostrando la imagen anterior hasta
+que el worker termina de convertirla y subirla.
+
+Las imágenes a borrar se encolan dentro de la transacción que las descarta
+(si se revierte, el job tampoco existe) y se suman al último job de borrado
+pendiente del hilo hasta ``PRODUCT_IMAGE_DELETE_BATCH_SIZE`` llaves: borrar
+200 productos desde el admin son unas pocas llamadas ``remove([...])`` en
+vez de 200. Un lote que falla se reintenta como cualquier otro job y, si se
+agotan los intentos, queda ``failed`` en el admin de tareas.
+"""
+
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.db import transaction
+
+from core.jobs import PermanentError, enqueue, task
+from core.models import Job
+
+from .catalog import bump_catalog_version
+from .images import ImageRejected
+from .models import Product
+from .storage import get_image_storage
+
+PROCESS_IMAGE_TASK = 'products.process_image'
+DELETE_IMAGES_TASK = 'products.delete_images'
+
+
+def enqueue_image_upload(product, filename, raw, content_type=''):
+    """Encola la conversión/subida de ``raw`` como nueva imagen de ``product``"""
+    return enqueue(
+        PROCESS_IMAGE_TASK,
+        {'product_id': product.pk, 'filename': filename, 'content_type': content_type},
+        blob=raw,
+    )
+
+
+def _superseded(job, product_id):
+    """Hay una subida más reciente para el mismo producto"""
+    return Job.objects.filter(
+        task=PROCESS_IMAGE_TASK,
+        payload__product_id=product_id,
+        status__in=['pending', 'running'],
+        id__gt=job.pk,
+    ).exists()
+
+
+@task(PROCESS_IMAGE_TASK, bind=True, timeout=60 * 2)
+def process_product_image(job, product_id, filename, content_type=''):
+    if _superseded(job, product_id):
+        return
+
+    try:
+        if job.blob is None:
+            # Un job ya terminado (p. ej. reintentado desde el admin) no
+            # conserva la imagen
+            raise PermanentError("El job ya no tiene la imagen subida")
+        upload = BytesIO(job.blob)
+        # Una sola copia del archivo en memoria mientras se procesa
+        job.blob = None
+        upload.content_type = content_type
+        key, sizes, formats = get_image_storage().save_image(filename, upload)
+    except Exception as exc:
+        # Sin más reintentos el producto queda marcado con error
+        if isinstance(exc, (ImageRejected, PermanentError)) or job.is_last_attempt:
+            Product.objects.filter(pk=product_id, image_status='processing').update(image_status='failed')
+            bump_catalog_version()
+        if isinstance(exc, ImageRejected):
+            raise PermanentError(str(exc)) from exc
+        raise
+
+    try:
+        with transaction.atomic():
+            product = Product.objects.select_for_update().filter(pk=product_id).first()
+            # El producto se borró, se quitó la imagen o llegó otra más reciente
+            current = (
+                product is not None
+                and product.image_status == 'processing'
+                and not _superseded(job, product_id)
+            )
+            if current:
+                previous = product.image
+                Product.objects.filter(pk=product_id).update(
+                    image=key, image_sizes=sizes, image_formats=formats, image_status='ready',
+                )
+                if previous:
+                    schedule_image_delete(previous)
+            else:
+                schedule_image_delete(key)
+    except Exception:
+        # La referencia que sumó ``save_image`` es de este intento; el
+        # reintento suma la suya, así que esta se suelta
+        schedule_image_delete(key)
+        raise
+
+    if current:
+        # ``update`` no dispara las señales del modelo
+        bump_catalog_version()
+
+
+def schedule_image_delete(key, using=None):
+    """
+    Borra ``key`` (y sus tamaños derivados) del storage cuando la transacción
+    en curso se confirme. El job se encola dentro de ella, así que si se
+    revierte (entera o hasta un savepoint) la imagen se conserva.
+    """
+    enqueue_image_deletes([key])
+
+
+# Último job de borrado que encoló cada hilo
+_delete_batch = threading.local()
+
+
+def enqueue_image_deletes(keys):
+    """
+    Encola el borrado de ``keys``. Mientras el último job de borrado que
+    encoló este hilo siga pendiente (ningún worker lo tomó y su transacción
+    no se revirtió) y tenga lugar, las llaves se suman a ese job.
+    """
+    batch_size = settings.PRODUCT_IMAGE_DELETE_BATCH_SIZE
+    keys = list(keys)
+    job_id = getattr(_delete_batch, 'job_id', None)
+    if keys and job_id is not None:
+        pending = Job.objects.filter(pk=job_id, task=DELETE_IMAGES_TASK, status='pending')
+        current = pending.values_list('payload', flat=True).first()
+        if current is not None and len(current['keys']) < batch_size:
+            room = batch_size - len(current['keys'])
+            # Condicional: si un worker lo tomó entre la lectura y el UPDATE,
+            # no se actualiza y las llaves van a un job nuevo
+            if pending.update(payload={'keys': current['keys'] + keys[:room]}):
+                keys = keys[room:]
+
+    for start in range(0, len(keys), batch_size):
+        job = enqueue(DELETE_IMAGES_TASK, {'keys': keys[start:start + batch_size]})
+        _delete_batch.job_id = job.pk
+
+
+@task(DELETE_IMAGES_TASK)
+def delete_product_images(keys):
+    get_image_storage().delete_many(keys)
@@ -0,0 +1,60 @@
+from django import template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from products.images import FORMAT_CONTENT_TYPES, stored_formats
+
+register = template.Library()
+
+
+@register.filter
+def image_url(product, size):
+    """``{{ product|image_url:320 }}``: URL del tamaño derivado más cercano"""
+    return product.image_url(int(size))
+
+
+@register.filter
+def image_resized(product, width):
+    """``{{ product|image_resized:480 }}``: imagen redimensionada al vuelo (``/img/``)"""
+    return product.image_resized_url(int(width))
+
+
+@register.simple_tag
+def picture_sources(product, sizes=''):
+    """
+    Un ``<source>`` por cada formato guardado mejor que el de respaldo del
+    ``<img>`` (AVIF y WebP si existe el JPEG)::
+
+        <picture style="display: contents">
+            {% picture_sources product sizes="50vw" %}
+            <img src="{{ product|fallback_image_url:320 }}"
+                 srcset="{{ product|fallback_srcset }}" sizes="50vw">
+        </picture>
+
+    Las imágenes que solo tienen WebP no generan ningún ``<source>``.
+    """
+    if not product.image or not product.image_sizes:
+        return ''
+    fallback = product.image_fallback_format
+    sources = [
+        format_html(
+            '<source type="{}" srcset="{}"{}>',
+            FORMAT_CONTENT_TYPES[fmt],
+            product.image_srcset(fmt),
+            format_html(' sizes="{}"', sizes) if sizes else '',
+        )
+        for fmt in stored_formats(product.image_formats)
+        if fmt != fallback
+    ]
+    return mark_safe('\n'.join(sources))
+
+
+@register.filter
+def fallback_image_url(product, size):
+    """Como ``image_url`` pero en el formato de respaldo (JPEG si existe)"""
+    return product.image_url(int(size), product.image_fallback_format)
+
+
+@register.filter
+def fallback_srcset(product):
+    return product.image_srcset(product.image_fallback_format)
@@ -0,0 +1,187 @@
+import gzip
+import json
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.disk_cache import DiskLRUCache
+
+from .models import Category, Product
+from .storage import LocalImageStorage
+
+
+def _png(size=(800, 600), color=(200, 120, 40)):
+    out = BytesIO()
+    Image.new('RGB', size, color).save(out, format='PNG')
+    out.seek(0)
+    return out
+
+
+class ImageProxyTests(TestCase):
+    """``/img/<llave>`` contra un LocalImageStorage y un DiskLRUCache temporales"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings = override_settings(
+            PRODUCT_IMAGE_STORAGE='products.storage.LocalImageStorage',
+            PRODUCT_IMAGE_DEDUPLICATE=False,
+            LOCAL_IMAGE_STORAGE_LATENCY=0,
+            MEDIA_ROOT=self.media_root,
+            PRODUCT_IMAGE_CACHE_DIR=self.cache_dir,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.key, sizes, formats = LocalImageStorage().save_image('foto.png', _png())
+        category = Category.objects.create(name='Tortas', slug='tortas')
+        Product.objects.create(
+            name='Torta', price=Decimal('1000'), category=category,
+            image=self.key, image_sizes=sizes, image_formats=formats,
+        )
+
+    def get(self, width, accept='image/webp', **params):
+        return self.client.get(f'/img/{self.key}', {'w': width, **params}, HTTP_ACCEPT=accept)
+
+    def test_miss_then_hit(self):
+        first = self.get(320)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(first['Content-Type'], 'image/webp')
+        with Image.open(BytesIO(first.content)) as img:
+            self.assertEqual(img.width, 320)
+
+        # La segunda vez sale del disco sin tocar el storage
+        with mock.patch.object(LocalImageStorage, 'download', side_effect=AssertionError):
+            second = self.get(320)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get(320)['ETag']
+        response = self.client.get(
+            f'/img/{self.key}', {'w': 320}, HTTP_ACCEPT='image/webp', HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_format_follows_accept(self):
+        self.assertEqual(self.get(320, accept='image/avif,image/webp')['Content-Type'], 'image/avif')
+        self.assertEqual(self.get(320, accept='image/png')['Content-Type'], 'image/jpeg')
+
+    def test_unknown_key_is_404(self):
+        response = self.client.get('/img/products/no-existe.webp', {'w': 320})
+        self.assertEqual(response.status_code, 404)
+
+    def test_object_missing_from_storage_is_404(self):
+        # Registrada en un producto pero ya no está en el storage
+        shutil.rmtree(self.media_root)
+        self.assertEqual(self.get(320).status_code, 404)
+
+    def test_invalid_params_are_400(self):
+        for params in ({'w': ''}, {'w': 'abc'}, {'w': 0}, {'w': -10}, {'w': 320, 'q': 0}, {'w': 320, 'q': 101}):
+            with self.subTest(params=params):
+                response = self.client.get(f'/img/{self.key}', params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_evicts_least_recently_used_over_max_bytes(self):
+        widths = (160, 240, 320)
+        sizes = dict(zip(widths, (len(self.get(width).content) for width in widths)))
+        # No caben las tres variantes; al pasarse se desaloja hasta volver al tope
+        cache = DiskLRUCache(tempfile.mkdtemp(dir=self.cache_dir), sum(sizes.values()) - 1, low_watermark=1)
+
+        def get(width):
+            # El mtime del sistema de archivos puede tener resolución gruesa
+            time.sleep(0.02)
+            return self.get(width)['X-Cache']
+
+        with mock.patch('products.views.get_resize_cache', return_value=cache):
+            self.assertEqual(get(160), 'MISS')
+            self.assertEqual(get(240), 'MISS')
+            self.assertEqual(get(160), 'HIT')
+            self.assertEqual(get(320), 'MISS')
+            self.assertLessEqual(cache.cull(), cache.max_bytes)
+            # 240 era la menos usada y se desalojó; 160 se había vuelto a usar
+            self.assertEqual(get(160), 'HIT')
+            self.assertEqual(get(240), 'MISS')
+
+
+class CatalogJsonTests(TestCase):
+    """``catalog.json`` (ETag por versión del catálogo) y ``search.json``"""
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user('cliente', password='x'))
+        # La versión del catálogo se incrementa al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            tortas = Category.objects.create(name='Tortas', slug='tortas')
+            postres = Category.objects.create(name='Postres', slug='postres')
+            self.torta = Product.objects.create(name='Torta de chocolate', price=Decimal('35000'), category=tortas)
+            self.postre = Product.objects.create(name='Postre de chocolate', price=Decimal('8000'), category=postres)
+            Product.objects.create(name='Torta agotada', price=Decimal('30000'), category=tortas, is_available=False)
+
+    def test_search_json_shape(self):
+        response = self.client.get('/products/search.json', {'q': 'chocolate'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {'query', 'ids'})
+        self.assertEqual(data['query'], 'chocolate')
+        self.assertCountEqual(data['ids'], [self.torta.id, self.postre.id])
+
+    def test_search_json_filters(self):
+        # Sin tildes ni mayúsculas, dentro de una categoría y sin productos agotados
+        data = self.client.get('/products/search.json', {'q': 'TORTA', 'category': 'tortas'}).json()
+        self.assertEqual(data['ids'], [self.torta.id])
+        self.assertEqual(self.client.get('/products/search.json', {'q': ' '}).json(), {'query': '', 'ids': []})
+
+    def test_search_json_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/products/search.json', {'q': 'torta'}).status_code, 302)
+
+    def test_catalog_json_shape(self):
+        response = self.client.get('/products/catalog.json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(set(data), {'version', 'categories', 'products'})
+        self.assertEqual({product['id'] for product in data['products']}, {self.torta.id, self.postre.id})
+        self.assertEqual(
+            set(data['products'][0]), {'id', 'name', 'price', 'weight', 'category', 'imageUrl'},
+        )
+
+    def test_catalog_json_not_modified_with_matching_etag(self):
+        first = self.client.get('/products/catalog.json')
+        etag = first['ETag']
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        second = self.client.get('/products/catalog.json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+        self.assertEqual(second['ETag'], etag)
+
+        # Un cambio en el catálogo cambia la versión y con ella el ETag
+        self.torta.price = Decimal('36000')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.torta.save()
+        third = self.client.get('/products/catalog.json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], etag)
+
+    def test_catalog_json_gzip_has_its_own_etag(self):
+        plain = self.client.get('/products/catalog.json')
+        compressed = self.client.get('/products/catalog.json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertEqual(
+            self.client.get('/products/catalog.json', HTTP_ACCEPT_ENCODING='gzip',
+                            HTTP_IF_NONE_MATCH=compressed['ETag']).status_code,
+            304,
+        )
@@ -8,4 +8,12 @@ urlpatterns = [
     path('', views.ProductListView.as_view(), name='list'),
     # Y también esta línea si existe
     path('<int:product_id>/', views.ProductDetailView.as_view(), name='detail'),
+    # Páginas siguientes del listado (scroll infinito en catálogos grandes)
+    path('page/', views.product_list_page, name='list_page'),
+    # Catálogo en JSON para el selector de productos del checkout
+    path('catalog.json', views.catalog_json, name='catalog_json'),
+    # Búsqueda con el índice en memoria (tildes, prefijos y errores de digitación)
+    path('search.json', views.search_json, name='search_json'),
+    # Métricas del cliente de Supabase Storage (solo staff)
+    path('storage-stats/', views.storage_stats, name='storage_stats'),
 ]
\ No newline at end of file
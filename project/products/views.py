@@ -1,91 +1,305 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.generic import ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import Q, Prefetch
-from django.core.cache import cache
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
 from .models import Product, Category
+from .catalog import bump_catalog_version, get_catalog, get_catalog_payload
+from .pagination import paginate_products, paginate_results
+from .search import search_products
+from .images import FORMAT_CONTENT_TYPES, derivative_key, negotiate_format, pick_size, render_width, resize_params
+from .storage import get_image_storage
+from core.disk_cache import DiskLRUCache
+from django.conf import settings
+from functools import lru_cache
+import hashlib
+import logging
 from orders.models import Order, OrderItem, BusinessSettings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 import json
+from io import BytesIO
 from datetime import datetime
 from django.urls import reverse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils.http import urlencode
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 
 
 # SEÑALES PARA INVALIDAR CACHE AUTOMÁTICAMENTE
 @receiver([post_save, post_delete], sender=Product)
-def invalidate_product_cache(sender, **kwargs):
+def invalidate_product_cache(sender, using=None, **kwargs):
     """Invalidar cache cuando se modifica un producto"""
-    cache.delete('active_categories_available')
-    cache.delete('active_categories')
-    # Invalidar cache de páginas también
-    cache.delete_many(['productlist_*', 'productdetail_*'])
+    # Nueva generación del catálogo: snapshot, páginas y fragmentos cacheados.
+    # Al confirmar la transacción: antes, otro worker reconstruiría el
+    # snapshot con las filas viejas y lo cachearía con la generación nueva
+    transaction.on_commit(bump_catalog_version, using=using)
     print("✅ Cache de productos invalidado automáticamente")
 
 @receiver([post_save, post_delete], sender=Category)
-def invalidate_category_cache(sender, **kwargs):
+def invalidate_category_cache(sender, using=None, **kwargs):
     """Invalidar cache cuando se modifica una categoría"""
-    cache.delete('active_categories_available')
-    cache.delete('active_categories')
+    transaction.on_commit(bump_catalog_version, using=using)
     print("✅ Cache de categorías invalidado automáticamente")
 
 
-# SIN CACHE en desarrollo para evitar problemas
-# @method_decorator(cache_page(60 * 5), name='dispatch')  # COMENTADO TEMPORALMENTE
+# Hasta este número de productos el listado se filtra y pagina en el navegador;
+# por encima se pinta solo la primera página y el resto llega con scroll infinito
+JS_FILTERING_LIMIT = 100
+PRODUCTS_PER_PAGE = 24
+# Máximo de resultados que devuelve la búsqueda (selectores y listado)
+SEARCH_RESULTS_LIMIT = 200
+
+
+def _server_page(request):
+    """
+    Página del listado en modo server, filtrada por ``?category=`` y ``?q=``.
+    Devuelve ``(productos, categoría, búsqueda, url_siguiente, resultados)``.
+
+    Sin búsqueda es un keyset sobre la BD en orden de nombre y ``resultados``
+    es None. Con búsqueda los productos salen del índice en memoria (tildes,
+    prefijos, errores) en orden de relevancia, hasta ``SEARCH_RESULTS_LIMIT``,
+    y se paginan sobre esa lista sin consultar la BD; ``resultados`` es
+    cuántos coincidieron, o ``SEARCH_RESULTS_LIMIT + 1`` si hay más.
+    """
+    category = request.GET.get('category', '').strip()
+    query = request.GET.get('q', '').strip()
+    token = request.GET.get('cursor')
+    matches = None
+    if query:
+        # Uno de más para saber si la lista quedó cortada
+        results = search_products(query, category=category or None, limit=SEARCH_RESULTS_LIMIT + 1)
+        matches = len(results)
+        products, cursor = paginate_results(results[:SEARCH_RESULTS_LIMIT], token, PRODUCTS_PER_PAGE)
+    else:
+        queryset = Product.objects.select_related('category').filter(is_available=True)
+        if category:
+            queryset = queryset.filter(category__slug=category)
+        products, cursor = paginate_products(queryset, token, PRODUCTS_PER_PAGE)
+    return products, category, query, _next_page_url(category, query, cursor), matches
+
+
+def _next_page_url(category, query, cursor):
+    if not cursor:
+        return ''
+    params = {'cursor': cursor}
+    if category:
+        params['category'] = category
+    if query:
+        params['q'] = query
+    return f"{reverse('products:list_page')}?{urlencode(params)}"
+
+
+# Sin cache de página: la página lleva datos de la sesión (usuario, mensajes,
+# CSRF). Lo caro se comparte entre todos los usuarios: el snapshot del
+# catálogo y el fragmento de la grilla, ambos por versión del catálogo.
 class ProductListView(LoginRequiredMixin, ListView):
     """Lista todos los productos disponibles"""
-    model = Product
     template_name = 'products/list.html'
     context_object_name = 'products'
-    paginate_by = None  # ← Eliminar paginación server-side
+    paginate_by = None  # La paginación la hace el navegador o el scroll infinito
     
     def get_queryset(self):
-        # SOLO carga inicial - sin filtros dinámicos
-        return Product.objects.select_related('category').filter(
-            is_available=True
-        ).only(
-            'id', 'name', 'price', 'weight', 'image',
-            'category__name', 'category__slug'
-        ).order_by('category__name', 'name')
+        # El snapshot del catálogo dice cuántos productos hay (sin consultas)
+        self.catalog = get_catalog()
+        self.use_js_filtering = len(self.catalog.products) <= JS_FILTERING_LIMIT
+        if self.use_js_filtering:
+            return list(self.catalog.products)
+        
+        # Catálogo grande: solo la primera página; el resto llega con scroll infinito
+        (products, self.active_category, self.search_query,
+         self.next_page_url, self.search_matches) = _server_page(self.request)
+        return products
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Categorías para filtros JS
-        context['categories'] = Category.objects.filter(
-            products__is_available=True
-        ).distinct().only('name', 'slug')
+        # Categorías para filtros
+        context['categories'] = self.catalog.categories
         
         # Flag para decidir entre JS vs Server pagination
-        products_count = context['products'].count()
-        context['use_js_filtering'] = products_count <= 100
-        context['products_count'] = products_count
+        context['use_js_filtering'] = self.use_js_filtering
+        context['products_count'] = len(self.catalog.products)
+        # Llave del fragmento cacheado de la grilla
+        context['catalog_version'] = self.catalog.version
+        
+        if not self.use_js_filtering:
+            context['active_category'] = self.active_category
+            context['search_query'] = self.search_query
+            context['next_page_url'] = self.next_page_url
+            if self.search_query:
+                # El encabezado cuenta los resultados, no todo el catálogo
+                context['search_count'] = min(self.search_matches, SEARCH_RESULTS_LIMIT)
+                context['search_truncated'] = self.search_matches > SEARCH_RESULTS_LIMIT
         
         return context
 
 
+@login_required
+def product_list_page(request):
+    """Página siguiente de tarjetas (fragmento HTML) para el scroll infinito"""
+    products, _, _, next_page_url, _ = _server_page(request)
+    return render(request, 'products/_product_page.html', {
+        'products': products,
+        'next_page_url': next_page_url,
+    })
+
+
 class ProductDetailView(LoginRequiredMixin, DetailView):
     """Muestra detalles de un producto específico"""
-    model = Product
     template_name = 'products/detail.html'
     context_object_name = 'product'
     pk_url_kwarg = 'product_id'
     login_url = 'login'
     
-    def get_queryset(self):
-        # ASEGURAR: Solo productos disponibles
-        return Product.objects.select_related('category').filter(is_available=True)
-    
     def get_object(self, queryset=None):
-        """Override para manejar productos no disponibles"""
-        try:
-            return super().get_object(queryset)
-        except Product.DoesNotExist:
+        # ASEGURAR: Solo productos disponibles (el snapshot solo contiene esos)
+        return get_catalog().get_product(self.kwargs.get(self.pk_url_kwarg))
+    
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if self.object is None:
             # Si el producto no está disponible, redirigir con mensaje
-            messages.error(self.request, 'El producto solicitado no está disponible.')
+            messages.error(request, 'El producto solicitado no está disponible.')
             return redirect('products:list')
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+
+@login_required
+def catalog_json(request):
+    """
+    Catálogo compacto en JSON para el selector de productos del step 2.
+
+    El ETag sale de la versión del catálogo, así que el navegador revalida
+    con un GET condicional y, mientras el catálogo no cambie, recibe un 304
+    sin cuerpo. La versión comprimida tiene su propio ETag.
+    """
+    catalog = get_catalog()
+    gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = f'"catalog-{catalog.version}{"-gz" if gzipped else ""}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        body, compressed = get_catalog_payload(catalog)
+        response = HttpResponse(compressed if gzipped else body, content_type='application/json')
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Length'] = len(response.content)
+
+    response['ETag'] = etag
+    # Privado (requiere sesión) y siempre revalidado contra el ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+@login_required
+def search_json(request):
+    """
+    Búsqueda de productos para el listado y el step 2.
+
+    Devuelve los ids que coinciden con ``?q=`` (opcionalmente dentro de
+    ``?category=``) ordenados por relevancia; el filtrado de tarjetas lo
+    hace el navegador con esos ids.
+    """
+    query = request.GET.get('q', '').strip()
+    category = request.GET.get('category', '').strip() or None
+    products = search_products(query, category=category, limit=SEARCH_RESULTS_LIMIT) if query else []
+    return JsonResponse({'query': query, 'ids': [product.id for product in products]})
+
+
+
+@staff_member_required
+def storage_stats(request):
+    """Latencia/errores por operación del cliente de Supabase de este worker (solo staff)"""
+    from .supabase_client import storage_stats as client_stats
+    return JsonResponse({'operations': client_stats()})
+
+
+logger = logging.getLogger(__name__)
+
+# Las llaves no cambian de contenido (hash o uuid), así que cada variante se
+# puede cachear en el navegador sin revalidar
+IMAGE_PROXY_MAX_AGE = 60 * 60 * 24 * 365
+
+
+@lru_cache(maxsize=None)
+def _disk_cache(location, max_bytes):
+    return DiskLRUCache(location, max_bytes)
+
+
+def get_resize_cache():
+    """Cache en disco de las variantes de ``/img/`` (compartido por el proceso)"""
+    return _disk_cache(settings.PRODUCT_IMAGE_CACHE_DIR, settings.PRODUCT_IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def _render_resized(key, width, quality, fmt):
+    """Baja la imagen del storage y la redimensiona; None si no se puede"""
+    # Solo imágenes de productos (no cualquier objeto del bucket)
+    sizes = Product.objects.filter(image=key).values_list('image_sizes', flat=True).first()
+    if sizes is None:
+        return None
+    # El menor tamaño guardado que cubre el ancho pedido: menos bytes que
+    # bajar y que decodificar
+    size = pick_size(sizes, width)
+    storage = get_image_storage()
+    # Si el derivado falta (p. ej. falló su subida) se usa el original
+    sources = [derivative_key(key, size), key] if size else [key]
+    for source in sources:
+        try:
+            raw = storage.download(source)
+            break
+        except FileNotFoundError:
+            continue
+        except Exception:
+            logger.exception("No se pudo descargar %s para /img/", source)
+            raise
+    else:
+        return None
+    try:
+        return render_width(BytesIO(raw), width, quality, fmt)
+    except Exception:
+        # Archivos que no son imágenes (subidas antiguas como binario)
+        return None
+
+
+def image_proxy(request, key):
+    """
+    Imagen de producto redimensionada al vuelo: ``/img/<llave>?w=480&q=80``.
+
+    El formato (AVIF, WebP o JPEG) se elige según el header ``Accept``. Cada
+    variante se genera una vez y se guarda en el cache en disco
+    (``PRODUCT_IMAGE_CACHE_DIR``, LRU por bytes totales); el navegador la
+    guarda un año y revalida con el ETag.
+    """
+    try:
+        width, quality = resize_params(request.GET.get('w', ''), request.GET.get('q'))
+    except ValueError:
+        return HttpResponseBadRequest('Parámetros inválidos: w (ancho) es obligatorio, q entre 1 y 100')
+
+    fmt = negotiate_format(request.headers.get('Accept', ''))
+    variant = f"{key}|w{width}|q{quality}|{fmt}"
+    etag = f'"{hashlib.sha256(variant.encode()).hexdigest()[:32]}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache = get_resize_cache()
+        data = cache.get(variant)
+        hit = data is not None
+        if not hit:
+            data = _render_resized(key, width, quality, fmt)
+            if data is None:
+                raise Http404('Imagen no encontrada')
+            cache.set(variant, data)
+        response = HttpResponse(data, content_type=FORMAT_CONTENT_TYPES[fmt])
+        response['Content-Length'] = len(data)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
 
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=IMAGE_PROXY_MAX_AGE, immutable=True)
+    patch_vary_headers(response, ('Accept',))
+    return response